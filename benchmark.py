@@ -0,0 +1,489 @@
+# benchmark.py
+#
+# Benchmark da coleta, unificação, carga e consultas do painel com dados sintéticos.
+# O gerador é determinístico (semente fixa) e produz registros no formato da API
+# (doses_aplicadas_pni), com cardinalidades próximas das reais: 27 UFs, ~5.570 municípios
+# com distribuição concentrada nas capitais, estabelecimentos proporcionais ao volume,
+# ~45 vacinas e pacientes que recebem mais de uma dose.
+#
+# Cada etapa roda em um processo novo, então o pico de memória (RSS) é o da etapa.
+# O resultado é gravado em JSON; com --comparar, cada métrica é comparada com um
+# resultado anterior e variações acima da tolerância são marcadas como regressão.
+#
+# Uso: python benchmark.py [--linhas=10k,100k] [--etapas=coleta,unificar,carga,consultas]
+#                          [--semente=42] [--dir=dados_benchmark] [--saida=arquivo.json]
+#                          [--comparar=anterior.json] [--tolerancia=0.10]
+#   tamanhos disponíveis: 10k, 100k, 1M e 10M. O JSON de entrada do unificar (~2 KB por
+#   registro, ~20 GB no 10M) só é gerado quando a etapa unificar é pedida.
+
+import contextlib
+import gzip
+import json
+import math
+import multiprocessing
+import os
+import platform
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+PASTA_PROJETO = Path(__file__).resolve().parent
+
+TAMANHOS = {"10k": 10_000, "100k": 100_000, "1M": 1_000_000, "10M": 10_000_000}
+ETAPAS = ["coleta", "unificar", "carga", "consultas"]
+REPETICOES_CONSULTA = 10
+# Diferenças absolutas abaixo destas não contam como regressão (ruído de medição)
+VARIACAO_MINIMA = {"segundos": 0.05, "pico_rss_mb": 5, "mediana_ms": 1.0}
+PAGINAS_MODELO = 50  # páginas distintas servidas pelo stub da API (ver servir_api)
+# Acima disto o unificar padrão (json.load do arquivo inteiro, ~5,5 KB de pico por
+# registro) não roda; o modo enxuto lê o JSON registro a registro e é sempre medido
+LINHAS_MAXIMAS_UNIFICAR = 1_000_000
+
+# Sigla, nome e número de municípios de cada UF
+UFS = [
+    ("AC", "Acre", 22), ("AL", "Alagoas", 102), ("AP", "Amapá", 16), ("AM", "Amazonas", 62),
+    ("BA", "Bahia", 417), ("CE", "Ceará", 184), ("DF", "Distrito Federal", 1), ("ES", "Espírito Santo", 78),
+    ("GO", "Goiás", 246), ("MA", "Maranhão", 217), ("MT", "Mato Grosso", 141), ("MS", "Mato Grosso do Sul", 79),
+    ("MG", "Minas Gerais", 853), ("PA", "Pará", 144), ("PB", "Paraíba", 223), ("PR", "Paraná", 399),
+    ("PE", "Pernambuco", 185), ("PI", "Piauí", 224), ("RJ", "Rio de Janeiro", 92), ("RN", "Rio Grande do Norte", 167),
+    ("RS", "Rio Grande do Sul", 497), ("RO", "Rondônia", 52), ("RR", "Roraima", 15), ("SC", "Santa Catarina", 295),
+    ("SP", "São Paulo", 645), ("SE", "Sergipe", 75), ("TO", "Tocantins", 139),
+]
+CAPITAIS = {"MG": "BELO HORIZONTE", "SP": "SAO PAULO", "RJ": "RIO DE JANEIRO", "AM": "MANAUS", "BA": "SALVADOR",
+            "CE": "FORTALEZA", "PR": "CURITIBA", "PE": "RECIFE", "RS": "PORTO ALEGRE", "DF": "BRASILIA"}
+
+LOCAIS_APLICACAO = [("1", "Deltóide", 40), ("2", "Vasto Lateral da Coxa", 25), ("3", "Boca", 12), ("4", "Glúteo", 6),
+                    ("5", "Antebraço", 4), ("6", "Ventro Glúteo", 3), ("7", "Dorso Glúteo", 2), ("8", "Nasal", 1),
+                    ("9", "Subcutâneo", 2), ("0", "Sem registro no sistema de informação de origem", 5)]
+
+
+# ---------- Gerador sintético ----------
+def _mistura(valor, semente):
+    # Hash inteiro barato e determinístico: atributos fixos de um paciente a partir do índice
+    valor = (valor * 0x9E3779B1 + semente * 0x85EBCA77) & 0xFFFFFFFF
+    valor ^= valor >> 15
+    valor = (valor * 0x2C1B3C6D) & 0xFFFFFFFF
+    return valor ^ (valor >> 12)
+
+
+def _zipf(quantidade, expoente=1.0):
+    return [1 / (posicao + 1) ** expoente for posicao in range(quantidade)]
+
+
+class GeradorSintetico:
+    def __init__(self, linhas, semente=42):
+        self.linhas = linhas
+        self.semente = semente
+        rnd = random.Random(semente)
+
+        self.municipios = []
+        for indice_uf, (sigla, nome_uf, quantidade) in enumerate(UFS):
+            for k in range(quantidade):
+                codigo = f"{indice_uf + 11}{k:04d}"
+                nome = CAPITAIS.get(sigla) if k == 0 and sigla in CAPITAIS else f"MUNICIPIO {codigo}"
+                self.municipios.append((codigo, nome, sigla, nome_uf))
+        # Capitais concentram as aplicações; os demais municípios seguem uma Zipf em ordem aleatória
+        capitais = [m for m in self.municipios if m[1] in CAPITAIS.values()]
+        demais = [m for m in self.municipios if m[1] not in CAPITAIS.values()]
+        rnd.shuffle(demais)
+        ordenados = capitais + demais
+        pesos = _zipf(len(ordenados), 0.8)
+
+        quantidade_estab = min(40_000, max(100, linhas // 25))
+        self.estabelecimentos = []
+        for i, municipio in enumerate(rnd.choices(ordenados, weights=pesos, k=quantidade_estab)):
+            self.estabelecimentos.append({
+                "codigo_cnes_estabelecimento": f"{1_000_000 + i:07d}",
+                "nome_razao_social_estabelecimento": f"SECRETARIA MUNICIPAL DE SAUDE {i}",
+                "nome_fantasia_estalecimento": f"UBS {i}",
+                "codigo_municipio_estabelecimento": municipio[0],
+                "nome_municipio_estabelecimento": municipio[1],
+                "sigla_uf_estabelecimento": municipio[2],
+                "nome_uf_estabelecimento": municipio[3],
+                "codigo_tipo_estabelecimento": str(1 + i % 20),
+                "descricao_tipo_estabelecimento": f"TIPO {1 + i % 20}",
+                "codigo_natureza_estabelecimento": str(1 + i % 4),
+                "descricao_natureza_estabelecimento": f"NATUREZA {1 + i % 4}",
+            })
+
+        self.vacinas = []
+        for i in range(45):
+            self.vacinas.append({
+                "codigo_vacina": str(i + 1),
+                "descricao_vacina": f"VACINA {i + 1}",
+                "sigla_vacina": f"V{i + 1}",
+                "codigo_vacina_fabricante": str(1 + i % 12),
+                "descricao_vacina_fabricante": f"FABRICANTE {1 + i % 12}",
+                "codigo_vacina_grupo_atendimento": str(1 + i % 30),
+                "descricao_vacina_grupo_atendimento": f"GRUPO {1 + i % 30}",
+                "codigo_vacina_categoria_atendimento": str(1 + i % 8),
+                "descricao_vacina_categoria_atendimento": f"CATEGORIA {1 + i % 8}",
+            })
+        self.pesos_vacinas = _zipf(len(self.vacinas), 1.1)
+
+        self.quantidade_pacientes = max(1, int(linhas / 1.6))
+        inicio = date(2025, 1, 1)
+        self.dias = [(inicio + timedelta(days=d)).isoformat() for d in range(365)]
+        # Fins de semana com bem menos aplicações
+        self.pesos_dias = [0.25 if (inicio + timedelta(days=d)).weekday() >= 5 else 1.0 for d in range(365)]
+
+    def paciente(self, indice):
+        h = _mistura(indice, self.semente)
+        municipio = self.municipios[h % len(self.municipios)]
+        etnia = None if h % 50 else str(h % 7)
+        return {
+            "codigo_paciente": f"{h:08x}{indice:08x}",
+            "tipo_sexo_paciente": "F" if h & 1 else "M",
+            "numero_idade_paciente": (h >> 3) % 101,
+            "numero_cep_paciente": f"{(h >> 5) % 100000:05d}",
+            "descricao_nacionalidade_paciente": "B",
+            "codigo_raca_cor_paciente": str((h >> 9) % 6),
+            "nome_raca_cor_paciente": f"RACA {(h >> 9) % 6}",
+            "codigo_etnia_indigena_paciente": etnia,
+            "nome_etnia_indigena_paciente": None if etnia is None else f"ETNIA {etnia}",
+            "codigo_municipio_paciente": municipio[0],
+            "nome_municipio_paciente": municipio[1],
+            "sigla_uf_paciente": municipio[2],
+            "nome_uf_paciente": municipio[3],
+        }
+
+    def pagina(self, pagina, tamanho=1000):
+        # Registros [pagina * tamanho, ...) gerados só a partir da semente e do número da página
+        inicio = pagina * tamanho
+        fim = min(self.linhas, inicio + tamanho)
+        if inicio >= fim:
+            return []
+        rnd = random.Random(self.semente * 1_000_003 + pagina)
+        quantidade = fim - inicio
+        estabs = rnd.choices(self.estabelecimentos, k=quantidade)
+        vacinas = rnd.choices(self.vacinas, weights=self.pesos_vacinas, k=quantidade)
+        dias = rnd.choices(self.dias, weights=self.pesos_dias, k=quantidade)
+        locais = rnd.choices(LOCAIS_APLICACAO, weights=[l[2] for l in LOCAIS_APLICACAO], k=quantidade)
+
+        registros = []
+        for i in range(quantidade):
+            maternal = str(rnd.randrange(1, 4)) if rnd.random() < 0.05 else None
+            registro = {
+                "codigo_documento": f"{self.semente:04d}-{inicio + i:010d}",
+                "data_vacina": dias[i],
+                "codigo_lote_vacina": f"L{rnd.randrange(5000):04d}",
+                "status_documento": "final",
+                "codigo_dose_vacina": str(rnd.randrange(1, 9)),
+                "descricao_dose_vacina": "DOSE",
+                "codigo_local_aplicacao": locais[i][0],
+                "descricao_local_aplicacao": locais[i][1],
+                "codigo_via_administracao": str(rnd.randrange(1, 6)),
+                "descricao_via_administracao": "VIA",
+                "codigo_estrategia_vacinacao": str(rnd.randrange(1, 9)),
+                "descricao_estrategia_vacinacao": "ESTRATEGIA",
+                "codigo_condicao_maternal": maternal,
+                "descricao_condicao_maternal": None if maternal is None else f"CONDICAO {maternal}",
+                "codigo_origem_registro": str(rnd.randrange(1, 4)),
+                "descricao_origem_registro": "ORIGEM",
+                "codigo_sistema_origem": str(rnd.randrange(1, 5)),
+                "descricao_sistema_origem": "SISTEMA",
+            }
+            registro.update(self.paciente(rnd.randrange(self.quantidade_pacientes)))
+            registro.update(estabs[i])
+            registro.update(vacinas[i])
+            registros.append(registro)
+        return registros
+
+    def registros(self, tamanho_pagina=1000):
+        for pagina in range(math.ceil(self.linhas / tamanho_pagina)):
+            yield from self.pagina(pagina, tamanho_pagina)
+
+
+def preparar_arquivos(linhas, semente, pasta, com_json=True, com_spool=True):
+    # JSON (entrada de unificar_jsons_em_tabela, ~2 KB por registro) e spool NDJSON
+    # (entrada da carga), gerados só quando alguma etapa pedida os usa e reaproveitados
+    # entre execuções com o mesmo tamanho e semente
+    pasta.mkdir(parents=True, exist_ok=True)
+    caminho_json = pasta / f"dados_{linhas}_{semente}.json"
+    caminho_spool = pasta / f"dados_{linhas}_{semente}.ndjson.gz"
+    gerar_json = com_json and not caminho_json.exists()
+    gerar_spool = com_spool and not caminho_spool.exists()
+    if not (gerar_json or gerar_spool):
+        return caminho_json, caminho_spool
+
+    print(f"Gerando {linhas:,} registros sintéticos em '{pasta}'...")
+    gerador = GeradorSintetico(linhas, semente)
+    with contextlib.ExitStack() as arquivos:
+        f_json = arquivos.enter_context(open(caminho_json, "w", encoding="utf-8")) if gerar_json else None
+        f_spool = arquivos.enter_context(gzip.open(caminho_spool, "wt", encoding="utf-8", compresslevel=1)) if gerar_spool else None
+        if f_json:
+            f_json.write("[")
+        for i, registro in enumerate(gerador.registros()):
+            texto = json.dumps(registro, ensure_ascii=False)
+            if f_json:
+                f_json.write(("," if i else "") + texto)
+            if f_spool:
+                f_spool.write(texto + "\n")
+        if f_json:
+            f_json.write("]")
+    return caminho_json, caminho_spool
+
+
+# ---------- Stub da API ----------
+def servir_api(linhas, semente, fila_porta):
+    # Servidor HTTP local no formato da API. Para o custo do servidor não entrar na medição
+    # da coleta, PAGINAS_MODELO páginas são geradas e serializadas antes de começar e a
+    # página N devolve o modelo N % PAGINAS_MODELO (a última página vem incompleta).
+    gerador = GeradorSintetico(linhas, semente)
+    modelos = [gerador.pagina(p) for p in range(min(PAGINAS_MODELO, math.ceil(linhas / 1000)))]
+    respostas = [json.dumps({"doses_aplicadas_pni": m}).encode("utf-8") for m in modelos]
+    total_paginas = math.ceil(linhas / 1000)
+    ultima = json.dumps({"doses_aplicadas_pni": modelos[-1][:linhas - (total_paginas - 1) * 1000]}).encode("utf-8")
+    vazia = json.dumps({"doses_aplicadas_pni": []}).encode("utf-8")
+
+    class Manipulador(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            pagina = int(parse_qs(urlparse(self.path).query).get("offset", ["0"])[0])
+            if pagina >= total_paginas:
+                corpo = vazia
+            elif pagina == total_paginas - 1:
+                corpo = ultima
+            else:
+                corpo = respostas[pagina % len(respostas)]
+            self.send_response(200)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(corpo)))
+            self.end_headers()
+            self.wfile.write(corpo)
+
+    servidor = ThreadingHTTPServer(("127.0.0.1", 0), Manipulador)
+    fila_porta.put(servidor.server_port)
+    servidor.serve_forever()
+
+
+# ---------- Etapas (cada uma roda em um processo novo) ----------
+def _pico_rss_mb():
+    from metricas import pico_memoria_mb
+    return pico_memoria_mb()
+
+
+def _silencioso():
+    return contextlib.redirect_stdout(open(os.devnull, "w"))
+
+
+def etapa_coleta(linhas, url, workers=8):
+    from tp2_extracao_carga import coletar_dados_vacinacao
+    base = _pico_rss_mb()
+    inicio = time.perf_counter()
+    with _silencioso():
+        dados = coletar_dados_vacinacao(max_paginas=math.ceil(linhas / 1000), salvar_arquivo=False,
+                                        workers=workers, taxa_por_segundo=None, base_url=url)
+    segundos = time.perf_counter() - inicio
+    return {"segundos": segundos, "registros": len(dados), "registros_por_s": len(dados) / segundos,
+            "paginas_por_s": math.ceil(linhas / 1000) / segundos, "rss_base_mb": base, "pico_rss_mb": _pico_rss_mb()}
+
+
+def etapa_unificar(caminho_json, enxuto=False):
+    from tp2_extracao_carga import unificar_jsons_em_tabela
+    base = _pico_rss_mb()
+    inicio = time.perf_counter()
+    df = unificar_jsons_em_tabela(str(caminho_json), enxuto=enxuto)
+    segundos = time.perf_counter() - inicio
+    return {"segundos": segundos, "registros": len(df), "registros_por_s": len(df) / segundos,
+            "memoria_dataframe_mb": df.memory_usage(deep=True).sum() / 1024 / 1024,
+            "rss_base_mb": base, "pico_rss_mb": _pico_rss_mb()}
+
+
+def etapa_carga(caminho_spool, caminho_db):
+    # Caminho padrão do script: spool em blocos, modo enxuto
+    from tp2_extracao_carga import criar_banco_e_popular, ler_spool_em_blocos
+    base = _pico_rss_mb()
+    inicio = time.perf_counter()
+    with _silencioso():
+        estatisticas = criar_banco_e_popular(ler_spool_em_blocos(str(caminho_spool), enxuto=True), caminho_db=str(caminho_db))
+    segundos = time.perf_counter() - inicio
+    registros = estatisticas.get("Aplicacao", [0])[0]
+    return {
+        "segundos": segundos, "registros": registros, "registros_por_s": registros / segundos,
+        "tamanho_banco_mb": os.path.getsize(caminho_db) / 1024 / 1024,
+        "tabelas": {t: {"linhas": n, "linhas_por_s": n / s if s else None} for t, (n, s) in estatisticas.items()},
+        "rss_base_mb": base, "pico_rss_mb": _pico_rss_mb(),
+    }
+
+
+def _latencias(executar, repeticoes):
+    executar()  # aquecimento
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        executar()
+        tempos.append((time.perf_counter() - inicio) * 1000)
+    tempos.sort()
+    return {"mediana_ms": statistics.median(tempos), "p95_ms": tempos[min(len(tempos) - 1, int(len(tempos) * 0.95))],
+            "min_ms": tempos[0]}
+
+
+def etapa_consultas(caminho_db, repeticoes=REPETICOES_CONSULTA):
+    # "colunar": o caminho principal do streamlit_app, a cópia colunar da carga (colunar.py);
+    # "painel": executar_consulta, usado sem a cópia colunar (com roteamento para os
+    # resumos, sem o cache de resultados);
+    # "sql": o texto de QUERIES direto sobre as tabelas do schema.sql
+    from colunar import snapshot_atual
+    from consultas import QUERIES, executar_consulta
+    conn = sqlite3.connect(f"file:{caminho_db}?mode=ro", uri=True)
+    colunar = snapshot_atual(str(caminho_db)) is not None
+    resultados = {}
+    for nome, sql in QUERIES.items():
+        resultados[nome] = {
+            "painel": _latencias(lambda: executar_consulta(str(caminho_db), nome), repeticoes),
+            "sql": _latencias(lambda: conn.execute(sql).fetchall(), repeticoes),
+        }
+        if colunar:
+            resultados[nome]["colunar"] = _latencias(lambda: snapshot_atual(str(caminho_db)).consultar(nome), repeticoes)
+    conn.close()
+    return {"consultas": resultados, "pico_rss_mb": _pico_rss_mb()}
+
+
+def _rodar(caminho_metricas, funcao, *args):
+    # As métricas das etapas vão para a pasta do benchmark, não para o metricas.db do projeto
+    import metricas
+    metricas.configurar(caminho_metricas)
+    return funcao(*args)
+
+
+def rodar_em_processo(pasta, funcao, *args):
+    contexto = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=contexto) as executor:
+        return executor.submit(_rodar, str(pasta / "metricas.db"), funcao, *args).result()
+
+
+def medir_tamanho(rotulo, semente, pasta, etapas):
+    linhas = TAMANHOS[rotulo]
+    caminho_db = pasta / f"vacinacao_{linhas}_{semente}.db"
+    carregar = "carga" in etapas or ("consultas" in etapas and not caminho_db.exists())
+    caminho_json, caminho_spool = preparar_arquivos(linhas, semente, pasta, com_json="unificar" in etapas,
+                                                    com_spool=carregar)
+    resultado = {"linhas": linhas, "etapas": {}, "ignoradas": {}}
+
+    if "coleta" in etapas:
+        contexto = multiprocessing.get_context("spawn")
+        fila = contexto.Queue()
+        servidor = contexto.Process(target=servir_api, args=(linhas, semente, fila), daemon=True)
+        servidor.start()
+        try:
+            url = f"http://127.0.0.1:{fila.get(timeout=600)}/"
+            resultado["etapas"]["coleta"] = rodar_em_processo(pasta, etapa_coleta, linhas, url)
+        finally:
+            servidor.terminate()
+            servidor.join()
+    if "unificar" in etapas:
+        if linhas <= LINHAS_MAXIMAS_UNIFICAR:
+            resultado["etapas"]["unificar"] = rodar_em_processo(pasta, etapa_unificar, caminho_json)
+        else:
+            resultado["ignoradas"]["unificar"] = f"acima de {LINHAS_MAXIMAS_UNIFICAR:,} registros só o modo enxuto é medido"
+        resultado["etapas"]["unificar_enxuto"] = rodar_em_processo(pasta, etapa_unificar, caminho_json, True)
+    if carregar:
+        resultado["etapas"]["carga"] = rodar_em_processo(pasta, etapa_carga, caminho_spool, caminho_db)
+    if "consultas" in etapas:
+        resultado["consultas"] = rodar_em_processo(pasta, etapa_consultas, caminho_db)["consultas"]
+
+    for etapa, medidas in resultado["etapas"].items():
+        print(f"  [{rotulo}] {etapa}: {medidas['segundos']:.2f}s, {medidas['registros_por_s']:,.0f} registros/s, "
+              f"pico {medidas['pico_rss_mb']:,.0f} MB")
+    for etapa, motivo in resultado["ignoradas"].items():
+        print(f"  [{rotulo}] {etapa}: ignorada ({motivo})")
+    for nome, medidas in resultado.get("consultas", {}).items():
+        print(f"  [{rotulo}] {nome}: " + ", ".join(f"{modo} {dados['mediana_ms']:.2f} ms" for modo, dados in medidas.items()))
+    return resultado
+
+
+def ambiente():
+    import numpy
+    import pandas
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=PASTA_PROJETO,
+                                capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"python": platform.python_version(), "sqlite": sqlite3.sqlite_version, "pandas": pandas.__version__,
+            "numpy": numpy.__version__, "plataforma": platform.platform(), "cpus": os.cpu_count(), "commit": commit}
+
+
+# ---------- Comparação entre execuções ----------
+def metricas(resultado):
+    # (tamanho, etapa/consulta, métrica) -> valor, para as métricas em que menor é melhor
+    valores = {}
+    for rotulo, medidas in resultado["resultados"].items():
+        for etapa, dados in medidas.get("etapas", {}).items():
+            valores[(rotulo, etapa, "segundos")] = dados["segundos"]
+            valores[(rotulo, etapa, "pico_rss_mb")] = dados["pico_rss_mb"]
+        for nome, dados in medidas.get("consultas", {}).items():
+            for modo, latencias in dados.items():
+                valores[(rotulo, f"{nome} ({modo})", "mediana_ms")] = latencias["mediana_ms"]
+    return valores
+
+
+def comparar(atual, anterior, tolerancia=0.10):
+    # Devolve a lista de regressões (variação acima da tolerância) e imprime todas as variações
+    if atual["semente"] != anterior["semente"]:
+        print("AVISO: execuções com sementes diferentes não são diretamente comparáveis.")
+    novos, antigos = metricas(atual), metricas(anterior)
+    regressoes = []
+    print(f"\nComparação com {anterior.get('ambiente', {}).get('commit')} (tolerância {tolerancia:.0%}):")
+    for chave in sorted(novos.keys() & antigos.keys()):
+        if not antigos[chave] or novos[chave] is None:
+            continue
+        variacao = novos[chave] / antigos[chave] - 1
+        marcador = ""
+        if variacao > tolerancia and novos[chave] - antigos[chave] >= VARIACAO_MINIMA[chave[2]]:
+            marcador = "  <-- REGRESSÃO"
+            regressoes.append((chave, antigos[chave], novos[chave]))
+        print(f"  {' / '.join(chave)}: {antigos[chave]:.2f} -> {novos[chave]:.2f} ({variacao:+.1%}){marcador}")
+    return regressoes
+
+
+def opcao(nome, padrao):
+    for argumento in sys.argv[1:]:
+        if argumento.startswith(f"--{nome}="):
+            return argumento.split("=", 1)[1]
+    return padrao
+
+
+if __name__ == "__main__":
+    tamanhos = opcao("linhas", "10k,100k").split(",")
+    etapas = opcao("etapas", ",".join(ETAPAS)).split(",")
+    semente = int(opcao("semente", "42"))
+    pasta = Path(opcao("dir", "dados_benchmark")).resolve()
+    saida = Path(opcao("saida", pasta / f"benchmark_{datetime.now():%Y%m%d_%H%M%S}.json")).resolve()
+    caminho_anterior = opcao("comparar", None)
+    caminho_anterior = caminho_anterior and Path(caminho_anterior).resolve()
+    invalidos = [t for t in tamanhos if t not in TAMANHOS] + [e for e in etapas if e not in ETAPAS]
+    if invalidos:
+        print(f"ERRO: opções desconhecidas: {', '.join(invalidos)}. Tamanhos: {', '.join(TAMANHOS)}; etapas: {', '.join(ETAPAS)}.")
+        sys.exit(2)
+
+    os.chdir(PASTA_PROJETO)  # schema.sql, indices.sql e resumos.sql são lidos da pasta do projeto
+    resultado = {"gerado_em": datetime.now().isoformat(timespec="seconds"), "semente": semente,
+                 "ambiente": ambiente(), "resultados": {}}
+    for rotulo in tamanhos:
+        print(f"\n== {rotulo} ==")
+        resultado["resultados"][rotulo] = medir_tamanho(rotulo, semente, pasta, etapas)
+
+    with open(saida, "w", encoding="utf-8") as f:
+        json.dump(resultado, f, ensure_ascii=False, indent=2)
+    print(f"\nResultado salvo em '{saida}'.")
+
+    if caminho_anterior:
+        with open(caminho_anterior, "r", encoding="utf-8") as f:
+            regressoes = comparar(resultado, json.load(f), float(opcao("tolerancia", "0.10")))
+        if regressoes:
+            print(f"\n{len(regressoes)} regressões acima da tolerância.")
+            sys.exit(1)
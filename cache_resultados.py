@@ -0,0 +1,83 @@
+# cache_resultados.py
+#
+# Cache de resultados das consultas do painel em um arquivo SQLite local, compartilhado
+# por todos os processos do Streamlit. A chave combina o texto SQL normalizado, os
+# parâmetros e a versão da carga gravada no banco (CargaVersao), então uma nova carga
+# invalida os resultados antigos na hora. O tamanho total é limitado com despejo LRU.
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+CAMINHO_CACHE = "cache_resultados.db"
+LIMITE_BYTES = 64 * 1024 * 1024
+
+
+class CacheResultados:
+    def __init__(self, caminho=CAMINHO_CACHE, limite_bytes=LIMITE_BYTES):
+        self.caminho = caminho
+        self.limite_bytes = limite_bytes
+        self.lock = threading.Lock()
+        self.conn = None
+
+    def conexao(self):
+        # Uma conexão por instância, usada sob self.lock por qualquer thread: as threads
+        # do Streamlit duram uma execução do script e a configuração abaixo roda uma vez só.
+        # WAL permite leituras enquanto outro processo grava.
+        if self.conn is None:
+            conn = sqlite3.connect(self.caminho, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode = WAL")
+            conn.execute("PRAGMA synchronous = NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS Resultado (
+                    chave TEXT PRIMARY KEY,
+                    versao TEXT NOT NULL,
+                    colunas TEXT NOT NULL,
+                    linhas TEXT NOT NULL,
+                    tamanho INTEGER NOT NULL,
+                    ultimo_acesso REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_resultado_acesso ON Resultado(ultimo_acesso)")
+            self.conn = conn
+        return self.conn
+
+    @staticmethod
+    def chave(sql, parametros, versao):
+        normalizado = " ".join(sql.split()).rstrip(";")
+        conteudo = json.dumps([normalizado, sorted((parametros or {}).items()), versao], ensure_ascii=False)
+        return hashlib.sha256(conteudo.encode("utf-8")).hexdigest()
+
+    def obter(self, chave):
+        # Devolve (colunas, linhas) ou None
+        with self.lock:
+            conn = self.conexao()
+            linha = conn.execute("SELECT colunas, linhas FROM Resultado WHERE chave = ?", (chave,)).fetchone()
+            if linha is None:
+                return None
+            conn.execute("UPDATE Resultado SET ultimo_acesso = ? WHERE chave = ?", (time.time(), chave))
+        return json.loads(linha[0]), [tuple(l) for l in json.loads(linha[1])]
+
+    def gravar(self, chave, versao, colunas, linhas):
+        texto_colunas = json.dumps(colunas, ensure_ascii=False)
+        texto_linhas = json.dumps(linhas, ensure_ascii=False)
+        with self.lock:
+            self.conexao().execute(
+                "INSERT OR REPLACE INTO Resultado (chave, versao, colunas, linhas, tamanho, ultimo_acesso) VALUES (?, ?, ?, ?, ?, ?)",
+                (chave, versao, texto_colunas, texto_linhas, len(texto_colunas) + len(texto_linhas), time.time())
+            )
+            self.despejar()
+
+    def despejar(self):
+        # Mantém os resultados acessados mais recentemente cuja soma cabe no limite;
+        # chamado com self.lock adquirido
+        self.conexao().execute("""
+            DELETE FROM Resultado WHERE chave IN (
+                SELECT chave FROM (
+                    SELECT chave, SUM(tamanho) OVER (ORDER BY ultimo_acesso DESC) AS acumulado FROM Resultado
+                ) WHERE acumulado > ?
+            )
+        """, (self.limite_bytes,))
+
@@ -0,0 +1,222 @@
+# colunar.py
+#
+# Cópia colunar da tabela Aplicacao para o painel: ao final da carga, cada aplicação é
+# gravada já combinada com os atributos que as consultas usam (faixa etária, município,
+# UF, dia, dia da semana, local de aplicação e vacina) em arquivos .npy de inteiros, um
+# por atributo, com os textos trocados por códigos (dicionarios.json). O painel abre os
+# arquivos com mmap e responde as Consultas 1–4 e seus filtros com máscaras e bincount
+# do NumPy, sem passar pelo SQLite.
+#
+# Códigos -1 indicam ausência: junção sem correspondente no banco ou valor nulo, com o
+# mesmo efeito das junções e condições das consultas de consultas.py.
+
+import json
+import os
+import shutil
+import sqlite3
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+
+FAIXAS_ETARIAS = ['Crianças (0-11)', 'Adolescentes (12-17)', 'Adultos (18-59)', 'Idosos (60+)', 'Não Informado']
+DIAS_SEMANA = ['Domingo', 'Segunda', 'Terça', 'Quarta', 'Quinta', 'Sexta', 'Sábado']
+SEM_REGISTRO = 'Sem registro no sistema de informação de origem'
+DIA_NULO = np.iinfo(np.int32).min
+
+# Colunas com dicionário: coluna -> tipo do array de códigos
+COLUNAS_CODIFICADAS = {'municipio': np.int32, 'uf': np.int16, 'local_aplicacao': np.int16, 'vacina': np.int32}
+
+# Uma linha por aplicação; junta pelos nomes do schema.sql (vale também para as views do
+# esquema compacto). tem_municipio distingue "sem município" de "município sem nome".
+SQL_EXPORTACAO = """
+    SELECT
+        CASE
+            WHEN p.id IS NULL THEN -1
+            WHEN p.idade < 12 THEN 0
+            WHEN p.idade BETWEEN 12 AND 17 THEN 1
+            WHEN p.idade BETWEEN 18 AND 59 THEN 2
+            WHEN p.idade >= 60 THEN 3
+            ELSE 4
+        END AS faixa_etaria,
+        m.codigo IS NOT NULL AS tem_municipio,
+        m.nome AS municipio,
+        m.uf_sigla AS uf,
+        CAST(julianday(a.data_aplicacao) - 2440587.5 AS INTEGER) AS dia,
+        CAST(strftime('%w', a.data_aplicacao) AS INTEGER) AS dia_semana,
+        l.descricao AS local_aplicacao,
+        v.descricao AS vacina
+    FROM Aplicacao AS a
+    LEFT JOIN Paciente AS p ON p.id = a.paciente_fk
+    LEFT JOIN Estabelecimento AS e ON e.id = a.estabelecimento_fk
+    LEFT JOIN Municipio AS m ON m.codigo = e.municipio_fk
+    LEFT JOIN LocalAplicacao AS l ON l.codigo = a.local_aplicacao_fk
+    LEFT JOIN Vacina AS v ON v.id = a.vacina_fk
+"""
+
+
+def pasta_padrao(caminho_db):
+    caminho_db = Path(caminho_db)
+    return caminho_db.with_name(f"{caminho_db.stem}_colunar")
+
+
+def _versao(conn):
+    try:
+        linha = conn.execute("SELECT versao FROM CargaVersao WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        linha = None
+    return linha[0] if linha else None
+
+
+def exportar_snapshot(caminho_db, pasta=None, tamanho_bloco=200_000):
+    # Grava a cópia colunar em uma pasta temporária e troca pela anterior só no final,
+    # então o painel nunca lê uma cópia pela metade
+    pasta = Path(pasta or pasta_padrao(caminho_db))
+    temporaria = pasta.with_name(pasta.name + ".tmp")
+    shutil.rmtree(temporaria, ignore_errors=True)
+    temporaria.mkdir(parents=True)
+
+    conn = sqlite3.connect(caminho_db)
+    linhas = conn.execute("SELECT COUNT(*) FROM Aplicacao").fetchone()[0]
+    arrays = {
+        'faixa_etaria': np.empty(linhas, np.int8),
+        'dia': np.empty(linhas, np.int32),
+        'dia_semana': np.empty(linhas, np.int8),
+        **{coluna: np.empty(linhas, tipo) for coluna, tipo in COLUNAS_CODIFICADAS.items()},
+    }
+    dicionarios = {coluna: {} for coluna in COLUNAS_CODIFICADAS}
+
+    def codificar(valores, dicionario, ausentes=(None,)):
+        return [-1 if v in ausentes else dicionario.setdefault(v, len(dicionario)) for v in valores]
+
+    cursor = conn.execute(SQL_EXPORTACAO)
+    inicio = 0
+    while True:
+        bloco = cursor.fetchmany(tamanho_bloco)
+        if not bloco:
+            break
+        fim = inicio + len(bloco)
+        faixa, tem_municipio, municipio, uf, dia, dia_semana, local, vacina = zip(*bloco)
+        arrays['faixa_etaria'][inicio:fim] = faixa
+        arrays['dia'][inicio:fim] = [DIA_NULO if d is None else d for d in dia]
+        arrays['dia_semana'][inicio:fim] = [-1 if d is None else d for d in dia_semana]
+        # O dicionário é por nome, como o GROUP BY m.nome da Consulta 3; um município sem
+        # nome ainda participa das consultas (como nas junções do SQL)
+        municipio = [m if tem else -1 for m, tem in zip(municipio, tem_municipio)]
+        arrays['municipio'][inicio:fim] = codificar(municipio, dicionarios['municipio'], ausentes=(-1,))
+        arrays['uf'][inicio:fim] = codificar(uf, dicionarios['uf'])
+        # Locais sem descrição e o "Sem registro" nunca entram na Consulta 4
+        arrays['local_aplicacao'][inicio:fim] = codificar(local, dicionarios['local_aplicacao'], ausentes=(None, SEM_REGISTRO))
+        arrays['vacina'][inicio:fim] = codificar(vacina, dicionarios['vacina'])
+        inicio = fim
+
+    for coluna, array in arrays.items():
+        np.save(temporaria / f"{coluna}.npy", array[:inicio])
+    with open(temporaria / "dicionarios.json", "w", encoding="utf-8") as f:
+        json.dump({coluna: list(valores) for coluna, valores in dicionarios.items()}, f, ensure_ascii=False)
+    with open(temporaria / "meta.json", "w", encoding="utf-8") as f:
+        json.dump({"linhas": inicio, "versao": _versao(conn),
+                   "mtime_banco": os.stat(caminho_db).st_mtime_ns}, f)
+    conn.close()
+
+    antiga = pasta.with_name(pasta.name + ".old")
+    shutil.rmtree(antiga, ignore_errors=True)
+    if pasta.exists():
+        pasta.rename(antiga)
+    temporaria.rename(pasta)
+    shutil.rmtree(antiga, ignore_errors=True)
+    return inicio
+
+
+class SnapshotColunar:
+    def __init__(self, pasta):
+        pasta = Path(pasta)
+        with open(pasta / "meta.json", "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        with open(pasta / "dicionarios.json", "r", encoding="utf-8") as f:
+            self.dicionarios = json.load(f)
+        self.codigos = {coluna: {v: i for i, v in enumerate(valores)} for coluna, valores in self.dicionarios.items()}
+        self.arrays = {
+            arquivo.stem: np.load(arquivo, mmap_mode="r")
+            for arquivo in pasta.glob("*.npy")
+        }
+
+    def mascara(self, filtros):
+        # None quando nenhum filtro restringe as linhas
+        mascara = None
+
+        def combinar(condicao):
+            nonlocal mascara
+            mascara = condicao if mascara is None else mascara & condicao
+
+        for coluna in ('municipio', 'uf', 'vacina'):
+            if coluna in filtros:
+                codigo = self.codigos[coluna].get(filtros[coluna], -2)  # -2: valor inexistente
+                combinar(self.arrays[coluna] == codigo)
+        if 'data_inicio' in filtros or 'data_fim' in filtros:
+            dia = self.arrays['dia']
+            combinar(dia != DIA_NULO)
+            if 'data_inicio' in filtros:
+                combinar(dia >= _dia(filtros['data_inicio']))
+            if 'data_fim' in filtros:
+                combinar(dia <= _dia(filtros['data_fim']))
+        return mascara
+
+    def contar(self, coluna, mascara, exigir=None):
+        # Contagem por código (índice 0 = código -1). `exigir` é uma coluna que precisa
+        # estar presente (código >= 0), como numa junção interna.
+        codigos = self.arrays[coluna]
+        if exigir is not None:
+            presente = self.arrays[exigir] >= 0
+            mascara = presente if mascara is None else mascara & presente
+        if mascara is not None:
+            codigos = codigos[mascara]
+        tamanho = len(self.dicionarios.get(coluna, FAIXAS_ETARIAS if coluna == 'faixa_etaria' else DIAS_SEMANA))
+        return np.bincount(codigos.astype(np.int64) + 1, minlength=tamanho + 1)
+
+    def consultar(self, nome, filtros=None):
+        # (colunas, linhas) como consultas.executar_consulta, ou None para consulta desconhecida
+        filtros = {f: v for f, v in (filtros or {}).items() if v not in (None, "")}
+        if nome not in CONSULTAS:
+            return None
+        colunas, coluna, exigir, limite = CONSULTAS[nome]
+        contagem = self.contar(coluna, self.mascara(filtros), exigir)
+
+        rotulos = {'faixa_etaria': FAIXAS_ETARIAS, 'dia_semana': DIAS_SEMANA}.get(coluna) or self.dicionarios[coluna]
+        linhas = [(rotulo, int(total)) for rotulo, total in zip(rotulos, contagem[1:]) if total]
+        # Na Consulta 2 o código -1 é a data nula, que o SQL agrupa como dia_semana NULL
+        if coluna == 'dia_semana' and contagem[0]:
+            linhas.append((None, int(contagem[0])))
+        linhas.sort(key=lambda linha: (-linha[1], str(linha[0])))
+        return colunas, linhas[:limite] if limite else linhas
+
+
+def _dia(texto):
+    return (date.fromisoformat(texto[:10]) - date(1970, 1, 1)).days
+
+
+# nome -> (colunas do resultado, coluna agrupada, coluna exigida pela junção, LIMIT)
+CONSULTAS = {
+    "Consulta 1 — Cobertura Vacinal por Faixa Etária": (['faixa_etaria', 'total_aplicacoes'], 'faixa_etaria', None, None),
+    "Consulta 2 — Vacinação por dia da semana": (['dia_semana', 'total_aplicacoes'], 'dia_semana', 'municipio', None),
+    "Consulta 3 — Top Municípios com Maior Número de Doses Aplicadas": (['municipio', 'total_doses'], 'municipio', None, 10),
+    "Consulta 4 — Locais Anatômicos Mais Utilizados": (['local_anatomico', 'total_aplicacoes'], 'local_aplicacao', None, 15),
+}
+
+_abertos = {}
+
+
+def snapshot_atual(caminho_db, pasta=None):
+    # Cópia colunar do banco, reaberta quando é regravada; None se ela não existe ou se o
+    # banco mudou depois dela (ex.: carga em andamento), e aí o painel volta ao SQLite
+    pasta = Path(pasta or pasta_padrao(caminho_db))
+    try:
+        marca = os.stat(pasta / "meta.json").st_mtime_ns
+        mtime_banco = os.stat(caminho_db).st_mtime_ns
+    except OSError:
+        return None
+    aberto = _abertos.get(pasta)
+    if aberto is None or aberto[0] != marca:
+        aberto = _abertos[pasta] = (marca, SnapshotColunar(pasta))
+    snapshot = aberto[1]
+    return snapshot if snapshot.meta["mtime_banco"] == mtime_banco else None
@@ -0,0 +1,489 @@
+# consultas.py
+#
+# Consultas SQL do painel, sem dependência do Streamlit, para poderem ser usadas
+# também pela carga e pelas ferramentas de análise (ex.: consultor_indices.py).
+#
+# Cada consulta é um modelo com os marcadores {juncoes} e {filtros}: montar_consulta
+# acrescenta só as junções e condições dos filtros informados (município, UF, vacina e
+# período), sempre com parâmetros nomeados, então o texto SQL não muda com os valores.
+
+import json
+import os
+import re
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+
+from cache_resultados import CAMINHO_CACHE, CacheResultados
+
+FAIXA_ETARIA = """
+            CASE
+                WHEN idade < 12 THEN 'Crianças (0-11)'
+                WHEN idade BETWEEN 12 AND 17 THEN 'Adolescentes (12-17)'
+                WHEN idade BETWEEN 18 AND 59 THEN 'Adultos (18-59)'
+                WHEN idade >= 60 THEN 'Idosos (60+)'
+                ELSE 'Não Informado'
+            END AS faixa_etaria"""
+
+DIA_SEMANA = """
+            CASE strftime('%w', data_aplicacao)
+                WHEN '0' THEN 'Domingo'
+                WHEN '1' THEN 'Segunda'
+                WHEN '2' THEN 'Terça'
+                WHEN '3' THEN 'Quarta'
+                WHEN '4' THEN 'Quinta'
+                WHEN '5' THEN 'Sexta'
+                WHEN '6' THEN 'Sábado'
+            END AS dia_semana"""
+
+# No esquema compacto (schema_compacto.sql) o dia da semana e o dia já estão gravados no
+# fato; calcular a partir de data_aplicacao converteria a data de cada linha pela view
+DIA_SEMANA_COMPACTO = """
+            CASE a.dia_semana
+                WHEN 0 THEN 'Domingo'
+                WHEN 1 THEN 'Segunda'
+                WHEN 2 THEN 'Terça'
+                WHEN 3 THEN 'Quarta'
+                WHEN 4 THEN 'Quinta'
+                WHEN 5 THEN 'Sexta'
+                WHEN 6 THEN 'Sábado'
+            END AS dia_semana"""
+
+# nome -> (apelido da tabela Aplicacao, junções que a consulta já faz, modelo SQL)
+MODELOS = {
+    "Consulta 1 — Cobertura Vacinal por Faixa Etária": ("Aplicacao", set(), f"""
+        SELECT{FAIXA_ETARIA},
+            COUNT(*) AS total_aplicacoes
+        FROM Paciente
+        JOIN Aplicacao ON Paciente.id = Aplicacao.paciente_fk{{juncoes}}{{filtros}}
+        GROUP BY faixa_etaria
+        ORDER BY total_aplicacoes DESC;
+    """),
+
+    "Consulta 2 — Vacinação por dia da semana": ("a", {"estabelecimento", "municipio"}, f"""
+        SELECT{DIA_SEMANA},
+            COUNT(*) AS total_aplicacoes
+        FROM Aplicacao AS a
+        JOIN Estabelecimento AS e ON a.estabelecimento_fk = e.id
+        JOIN Municipio AS m ON e.municipio_fk = m.codigo{{juncoes}}{{filtros}}
+        GROUP BY dia_semana
+        ORDER BY total_aplicacoes DESC;
+    """),
+
+    "Consulta 3 — Top Municípios com Maior Número de Doses Aplicadas": ("a", {"estabelecimento", "municipio"}, """
+        SELECT
+            m.nome AS municipio,
+            COUNT(*) AS total_doses
+        FROM Aplicacao AS a
+        JOIN Estabelecimento AS e ON a.estabelecimento_fk = e.id
+        JOIN Municipio AS m ON e.municipio_fk = m.codigo{juncoes}{filtros}
+        GROUP BY m.nome
+        ORDER BY total_doses DESC
+        LIMIT 10;
+    """),
+
+    "Consulta 4 — Locais Anatômicos Mais Utilizados": ("a", set(), """
+        SELECT
+            l.descricao AS local_anatomico,
+            COUNT(*) AS total_aplicacoes
+        FROM Aplicacao AS a
+        JOIN LocalAplicacao AS l ON a.local_aplicacao_fk = l.codigo{juncoes}
+        WHERE l.descricao != 'Sem registro no sistema de informação de origem'{filtros}
+        GROUP BY l.descricao
+        ORDER BY total_aplicacoes DESC
+        LIMIT 15;
+    """),
+}
+
+# Junções usadas pelos filtros ({a} é o apelido da tabela Aplicacao na consulta)
+JUNCOES = {
+    "estabelecimento": "JOIN Estabelecimento AS e ON {a}.estabelecimento_fk = e.id",
+    "municipio": "JOIN Municipio AS m ON e.municipio_fk = m.codigo",
+    "vacina": "JOIN Vacina AS v ON {a}.vacina_fk = v.id",
+}
+
+# filtro -> (junções necessárias, condição); o município e a UF são os do estabelecimento
+FILTROS = {
+    "municipio": (["estabelecimento", "municipio"], "m.nome = :municipio"),
+    "uf": (["estabelecimento", "municipio"], "m.uf_sigla = :uf"),
+    "vacina": (["vacina"], "v.descricao = :vacina"),
+    "data_inicio": ([], "{a}.data_aplicacao >= :data_inicio"),
+    "data_fim": ([], "{a}.data_aplicacao <= :data_fim"),
+}
+
+# Condições que mudam no esquema compacto: as datas comparadas como dias desde 1970-01-01
+FILTROS_COMPACTO = {
+    "data_inicio": "{a}.dia >= CAST(julianday(:data_inicio) - 2440587.5 AS INTEGER)",
+    "data_fim": "{a}.dia <= CAST(julianday(:data_fim) - 2440587.5 AS INTEGER)",
+}
+
+# As mesmas consultas respondidas pelas tabelas de resumo (resumos.sql), que a carga
+# mantém atualizadas, com os filtros que cada resumo consegue atender
+MODELOS_RESUMO = {
+    "Consulta 1 — Cobertura Vacinal por Faixa Etária": ({
+        "municipio": "municipio_nome = :municipio",
+        "uf": "uf_sigla = :uf",
+        "data_inicio": "data_aplicacao >= :data_inicio",
+        # O resumo grava a data ausente como '', que seria menor que qualquer data
+        "data_fim": "data_aplicacao != '' AND data_aplicacao <= :data_fim",
+    }, """
+        SELECT faixa_etaria, SUM(total) AS total_aplicacoes
+        FROM ResumoFaixaEtaria{filtros}
+        GROUP BY faixa_etaria
+        ORDER BY total_aplicacoes DESC;
+    """),
+
+    "Consulta 2 — Vacinação por dia da semana": ({
+        "municipio": "municipio_nome = :municipio",
+        "uf": "uf_sigla = :uf",
+    }, """
+        SELECT
+            CASE dia_semana
+                WHEN '0' THEN 'Domingo'
+                WHEN '1' THEN 'Segunda'
+                WHEN '2' THEN 'Terça'
+                WHEN '3' THEN 'Quarta'
+                WHEN '4' THEN 'Quinta'
+                WHEN '5' THEN 'Sexta'
+                WHEN '6' THEN 'Sábado'
+            END AS dia_semana,
+            SUM(total) AS total_aplicacoes
+        FROM ResumoDiaSemana{filtros}
+        GROUP BY dia_semana
+        ORDER BY total_aplicacoes DESC;
+    """),
+
+    "Consulta 3 — Top Municípios com Maior Número de Doses Aplicadas": ({
+        "municipio": "municipio_nome = :municipio",
+        "uf": "uf_sigla = :uf",
+    }, """
+        SELECT municipio_nome AS municipio, SUM(total) AS total_doses
+        FROM ResumoDiaSemana{filtros}
+        GROUP BY municipio_nome
+        ORDER BY total_doses DESC
+        LIMIT 10;
+    """),
+
+    "Consulta 4 — Locais Anatômicos Mais Utilizados": ({}, """
+        SELECT descricao AS local_anatomico, SUM(total) AS total_aplicacoes
+        FROM ResumoLocalAplicacao
+        WHERE descricao != 'Sem registro no sistema de informação de origem'{filtros}
+        GROUP BY descricao
+        ORDER BY total_aplicacoes DESC
+        LIMIT 15;
+    """),
+}
+
+TABELAS_RESUMO = ["ResumoFaixaEtaria", "ResumoDiaSemana", "ResumoLocalAplicacao"]
+
+
+def _clausula_filtros(modelo, condicoes):
+    if not condicoes:
+        return ""
+    ja_tem_where = "WHERE" in modelo.split("{filtros}")[0]
+    inicio = "\n          AND " if ja_tem_where else "\n        WHERE "
+    return inicio + "\n          AND ".join(condicoes)
+
+
+def filtros_ativos(filtros):
+    return {nome: valor for nome, valor in (filtros or {}).items() if nome in FILTROS and valor not in (None, "")}
+
+
+def montar_consulta(nome, filtros=None, compacto=False):
+    # Devolve (sql, parâmetros) da consulta `nome` sobre as tabelas do schema.sql; com
+    # compacto=True usa as colunas dia/dia_semana do schema_compacto.sql
+    apelido, presentes, modelo = MODELOS[nome]
+    filtros = filtros_ativos(filtros)
+    if compacto:
+        modelo = modelo.replace(DIA_SEMANA, DIA_SEMANA_COMPACTO)
+
+    juncoes, condicoes = [], []
+    for filtro in filtros:
+        necessarias, condicao = FILTROS[filtro]
+        if compacto:
+            condicao = FILTROS_COMPACTO.get(filtro, condicao)
+        for juncao in necessarias:
+            if juncao not in presentes and juncao not in juncoes:
+                juncoes.append(juncao)
+        condicoes.append(condicao.format(a=apelido))
+
+    texto_juncoes = "".join(f"\n        {JUNCOES[j].format(a=apelido)}" for j in juncoes)
+    sql = modelo.format(juncoes=texto_juncoes, filtros=_clausula_filtros(modelo, condicoes))
+    return sql, filtros
+
+
+def montar_consulta_resumo(nome, filtros=None):
+    # Mesma consulta sobre as tabelas de resumo, ou None se algum filtro não for atendido
+    suportados, modelo = MODELOS_RESUMO[nome]
+    filtros = filtros_ativos(filtros)
+    if any(filtro not in suportados for filtro in filtros):
+        return None
+    condicoes = [suportados[filtro] for filtro in filtros]
+    return modelo.format(filtros=_clausula_filtros(modelo, condicoes)), filtros
+
+
+# Texto das consultas sem filtros (o que o painel exibe e o que o consultor de índices analisa)
+QUERIES = {nome: montar_consulta(nome)[0] for nome in MODELOS}
+
+
+def tem_resumos(conn):
+    existentes = conn.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ({', '.join('?' * len(TABELAS_RESUMO))})",
+        TABELAS_RESUMO
+    ).fetchone()[0]
+    return existentes == len(TABELAS_RESUMO)
+
+
+def eh_banco_compacto(conn):
+    return conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'AplicacaoFato'").fetchone() is not None
+
+
+def escolher_consulta(conn, nome, filtros=None):
+    # Usa as tabelas de resumo quando o banco as tem e elas atendem todos os filtros
+    if tem_resumos(conn):
+        resumo = montar_consulta_resumo(nome, filtros)
+        if resumo is not None:
+            return resumo
+    return montar_consulta(nome, filtros, eh_banco_compacto(conn))
+
+
+# Valores disponíveis para cada filtro no painel
+OPCOES_FILTROS = {
+    "municipio": "SELECT DISTINCT nome FROM Municipio WHERE nome IS NOT NULL ORDER BY nome",
+    "uf": "SELECT sigla FROM UF ORDER BY sigla",
+    "vacina": "SELECT DISTINCT descricao FROM Vacina WHERE descricao IS NOT NULL ORDER BY descricao",
+}
+
+
+# ---------- Conexões de leitura ----------
+# Pool de conexões somente leitura do processo, por banco. O Streamlit roda cada execução
+# do script em uma thread nova, que termina junto com ela, então as conexões não podem
+# pertencer à thread: cada uma é emprestada a uma thread por vez e volta ao pool, e é
+# descartada quando o arquivo do banco muda. O cache de statements do sqlite3 reaproveita
+# as consultas já preparadas, já que o texto SQL não depende dos valores dos filtros.
+MAXIMO_CONEXOES_LIVRES = 8
+_livres = {}
+_lock_conexoes = threading.Lock()
+
+
+@contextmanager
+def conexao_leitura(caminho_db, imutavel=False):
+    # imutavel=True (immutable=1) dispensa o controle de locks do SQLite; use apenas
+    # quando nenhuma carga roda enquanto o painel está no ar
+    versao = os.stat(caminho_db).st_mtime_ns
+    chave = (os.path.abspath(caminho_db), imutavel)
+    conn = None
+    with _lock_conexoes:
+        livres = _livres.setdefault(chave, [])
+        while livres and conn is None:
+            candidata, versao_candidata = livres.pop()
+            if versao_candidata == versao:
+                conn = candidata
+            else:
+                candidata.close()
+    if conn is None:
+        uri = f"file:{chave[0]}?mode=ro" + ("&immutable=1" if imutavel else "")
+        conn = sqlite3.connect(uri, uri=True, cached_statements=256, check_same_thread=False)
+
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        with _lock_conexoes:
+            livres = _livres.setdefault(chave, [])
+            if len(livres) < MAXIMO_CONEXOES_LIVRES:
+                livres.append((conn, versao))
+                conn = None
+        if conn is not None:
+            conn.close()
+
+
+def versao_carga(conn, caminho_db):
+    # Identificador gravado pela carga (CargaVersao); bancos antigos usam a data do arquivo
+    try:
+        linha = conn.execute("SELECT versao FROM CargaVersao WHERE id = 1").fetchone()
+    except sqlite3.OperationalError:
+        linha = None
+    return linha[0] if linha else str(os.stat(caminho_db).st_mtime_ns)
+
+
+def plano_da_consulta(conn, sql, parametros=None):
+    return [linha[3] for linha in conn.execute(f"EXPLAIN QUERY PLAN {sql}", parametros or {})]
+
+
+def _consultar(conn, caminho_db, sql, parametros, cache=None, info=None):
+    # `info`, se informado, recebe o SQL executado, os parâmetros, o resultado no cache
+    # ("acerto", "falha" ou None sem cache) e o plano da consulta quando ela roda no banco
+    if info is not None:
+        info.update(sql=sql, parametros=parametros, cache=None, plano=None)
+
+    def rodar():
+        if info is not None:
+            info["plano"] = plano_da_consulta(conn, sql, parametros)
+        cursor = conn.execute(sql, parametros)
+        return [c[0] for c in cursor.description], cursor.fetchall()
+
+    if cache is None:
+        return rodar()
+
+    # Versão e resultado lidos na mesma transação, para não guardar dados de uma carga
+    # com a versão de outra
+    conn.execute("BEGIN")
+    try:
+        versao = versao_carga(conn, caminho_db)
+        chave = cache.chave(sql, parametros, versao)
+        resultado = cache.obter(chave)
+        if info is not None:
+            info["cache"] = "falha" if resultado is None else "acerto"
+        if resultado is None:
+            resultado = rodar()
+            cache.gravar(chave, versao, *resultado)
+    finally:
+        conn.execute("COMMIT")
+    return resultado
+
+
+def executar_consulta(caminho_db, nome, filtros=None, imutavel=False, cache=None, info=None):
+    # Devolve (colunas, linhas) da consulta `nome` com os filtros informados; com `cache`
+    # (um CacheResultados) o resultado é reaproveitado enquanto a versão da carga não mudar
+    with conexao_leitura(caminho_db, imutavel) as conn:
+        sql, parametros = escolher_consulta(conn, nome, filtros)
+        return _consultar(conn, caminho_db, sql, parametros, cache, info)
+
+
+def listar_opcoes(caminho_db, filtro, imutavel=False, cache=None):
+    with conexao_leitura(caminho_db, imutavel) as conn:
+        _, linhas = _consultar(conn, caminho_db, OPCOES_FILTROS[filtro], {}, cache)
+    return [linha[0] for linha in linhas]
+
+
+def aquecer_cache(caminho_db, cache=None):
+    # Chamado ao final da carga: deixa no cache as consultas sem filtros e as opções dos
+    # filtros. Sem `cache`, usa o arquivo de cache da pasta do banco: para o vacinacao.db
+    # é o mesmo que o painel lê, e bancos de outras pastas (ex.: os do benchmark) não
+    # enchem o cache do painel.
+    cache = cache or CacheResultados(os.path.join(os.path.dirname(os.path.abspath(caminho_db)), CAMINHO_CACHE))
+    for nome in MODELOS:
+        executar_consulta(caminho_db, nome, cache=cache)
+    for filtro in OPCOES_FILTROS:
+        listar_opcoes(caminho_db, filtro, cache=cache)
+
+
+# ---------- Banco particionado por UF ----------
+# Com a carga particionada (criar_banco_e_popular(..., particionar=True)), Aplicacao,
+# Paciente e Estabelecimento ficam em um banco por UF do estabelecimento e as demais
+# tabelas são copiadas em todos. Cada consulta roda em paralelo nos bancos necessários
+# e as contagens parciais são somadas por rótulo; o LIMIT só é aplicado depois da soma.
+ARQUIVO_MANIFESTO = "shards.json"
+# Criado na importação, e não na primeira consulta, para que execuções simultâneas do
+# script não criem cada uma o seu pool; as threads só começam no primeiro uso
+_executor_particoes = ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) + 4),
+                                         thread_name_prefix="particoes")
+
+
+def pasta_particoes_padrao(caminho_db):
+    caminho_db = Path(caminho_db)
+    return caminho_db.with_name(f"{caminho_db.stem}_shards")
+
+
+def ler_manifesto(pasta_particoes):
+    # {"versao", "shards": {sigla: arquivo}, "ufs" e "municipios": {nome: [siglas]}} ou None
+    try:
+        with open(os.path.join(pasta_particoes, ARQUIVO_MANIFESTO), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def particoes_ativas(caminho_db, pasta_particoes=None):
+    # Usa as partições quando elas são mais recentes que o banco único (ou ele não existe)
+    manifesto = os.path.join(pasta_particoes or pasta_particoes_padrao(caminho_db), ARQUIVO_MANIFESTO)
+    if not os.path.exists(manifesto):
+        return False
+    return not os.path.exists(caminho_db) or os.stat(manifesto).st_mtime_ns >= os.stat(caminho_db).st_mtime_ns
+
+
+def particoes_dos_filtros(manifesto, filtros=None):
+    # Filtro por UF ou por município vai só para as partições com estabelecimentos nele
+    # (os filtros usam o município do estabelecimento, não a UF da partição)
+    filtros = filtros_ativos(filtros)
+    siglas = list(manifesto["shards"])
+    for filtro, mapa in (("uf", "ufs"), ("municipio", "municipios")):
+        if filtro in filtros:
+            com_valor = manifesto[mapa].get(filtros[filtro], [])
+            siglas = [s for s in siglas if s in com_valor]
+    # Nenhuma partição atende: consulta uma só, que devolve as colunas sem linhas
+    return siglas or list(manifesto["shards"])[:1]
+
+
+def caminho_particao(pasta_particoes, manifesto, sigla=None):
+    # Sem `sigla`, qualquer partição serve (ex.: dimensões, que estão em todas)
+    sigla = sigla or next(iter(manifesto["shards"]))
+    return os.path.join(pasta_particoes, manifesto["shards"][sigla])
+
+
+def _sem_limite(sql):
+    encontrado = re.search(r"\s+LIMIT\s+(\d+)", sql)
+    if encontrado is None:
+        return sql, None
+    return sql[:encontrado.start()] + sql[encontrado.end():], int(encontrado.group(1))
+
+
+def executar_consulta_particionada(pasta_particoes, nome, filtros=None, imutavel=False, cache=None, info=None):
+    # Como executar_consulta, sobre as partições; as consultas do painel são todas
+    # (rótulo, contagem), então o resultado final é a soma das contagens por rótulo.
+    # No cache, a versão é a do manifesto, trocada a cada carga particionada.
+    manifesto = ler_manifesto(pasta_particoes)
+    siglas = particoes_dos_filtros(manifesto, filtros)
+    if info is not None:
+        info.update(sql=None, parametros=filtros_ativos(filtros), cache=None, plano=None)
+
+    chave = None
+    if cache is not None:
+        chave = cache.chave(f"particoes:{nome}", filtros_ativos(filtros), manifesto["versao"])
+        resultado = cache.obter(chave)
+        if info is not None:
+            info["cache"] = "falha" if resultado is None else "acerto"
+        if resultado is not None:
+            return resultado
+
+    def parcial(sigla):
+        with conexao_leitura(caminho_particao(pasta_particoes, manifesto, sigla), imutavel) as conn:
+            sql, parametros = escolher_consulta(conn, nome, filtros)
+            sql, limite = _sem_limite(sql)
+            cursor = conn.execute(sql, parametros)
+            return [c[0] for c in cursor.description], cursor.fetchall(), limite, sql, parametros
+
+    parciais = list(_executor_particoes.map(parcial, siglas))
+    colunas, _, limite, sql, parametros = parciais[0]
+    totais = {}
+    for _, linhas, _, _, _ in parciais:
+        for rotulo, total in linhas:
+            totais[rotulo] = totais.get(rotulo, 0) + total
+    linhas = sorted(totais.items(), key=lambda linha: -linha[1])[:limite]
+
+    if info is not None:
+        with conexao_leitura(caminho_particao(pasta_particoes, manifesto, siglas[0]), imutavel) as conn:
+            info.update(sql=sql, parametros=parametros,
+                        plano=[f"partições: {', '.join(siglas)}"] + plano_da_consulta(conn, sql, parametros))
+    if chave is not None:
+        cache.gravar(chave, manifesto["versao"], colunas, linhas)
+    return colunas, linhas
+
+
+def listar_opcoes_particionadas(pasta_particoes, filtro, imutavel=False, cache=None):
+    # As dimensões são copiadas em todas as partições; basta uma
+    manifesto = ler_manifesto(pasta_particoes)
+    return listar_opcoes(caminho_particao(pasta_particoes, manifesto), filtro, imutavel, cache)
+
+
+def aquecer_cache_particoes(pasta_particoes, cache=None):
+    # aquecer_cache para a carga particionada; o arquivo de cache fica ao lado da pasta
+    cache = cache or CacheResultados(os.path.join(os.path.dirname(os.path.abspath(pasta_particoes)), CAMINHO_CACHE))
+    for nome in MODELOS:
+        executar_consulta_particionada(pasta_particoes, nome, cache=cache)
+    for filtro in OPCOES_FILTROS:
+        listar_opcoes_particionadas(pasta_particoes, filtro, cache=cache)
@@ -0,0 +1,258 @@
+# consultor_indices.py
+#
+# Consultor de índices para as consultas do painel: roda EXPLAIN QUERY PLAN em todas as
+# consultas registradas em consultas.py, aponta varreduras completas e B-trees temporárias,
+# propõe índices de cobertura, mede a latência antes/depois no banco carregado e grava em
+# indices.sql (aplicado ao final de toda carga) só os índices que deixaram mais rápidas as
+# consultas que os usam; os demais são removidos e listados como rejeitados.
+#
+# Uso: python consultor_indices.py [vacinacao.db] [--aplicar]
+#   sem --aplicar os índices candidatos são removidos ao final e indices.sql não é alterado.
+
+import re
+import sqlite3
+import statistics
+import sys
+import time
+
+from consultas import MODELOS, montar_consulta, plano_da_consulta
+
+PALAVRAS_RESERVADAS = {"ON", "WHERE", "JOIN", "GROUP", "ORDER", "LIMIT", "LEFT", "INNER", "CROSS", "USING"}
+CABECALHO_INDICES = "-- Índices secundários, criados por criar_indices depois que os dados já foram carregados"
+MARCADOR_CONSULTOR = "-- Índices de cobertura propostos por consultor_indices.py"
+
+
+# Diferença de latência abaixo da qual a mudança é tratada como ruído de medição
+GANHO_MINIMO = 0.10  # fração da latência antes dos índices
+VARIACAO_MINIMA = 0.0005  # segundos
+
+# Combinações de filtros analisadas além da consulta sem filtros
+FILTROS_ANALISADOS = {
+    "BH": {"municipio": "BELO HORIZONTE"},
+    "MG": {"uf": "MG"},
+}
+
+
+def consultas_registradas():
+    # nome -> (sql, parâmetros) de cada consulta do painel, sem e com os filtros acima
+    consultas = {}
+    for nome in MODELOS:
+        consultas[nome] = montar_consulta(nome)
+        for rotulo, filtros in FILTROS_ANALISADOS.items():
+            consultas[f"{nome} ({rotulo})"] = montar_consulta(nome, filtros)
+    return consultas
+
+
+def problemas_do_plano(detalhes):
+    # Varredura de tabela (sem índice de cobertura) e ordenações/agrupamentos temporários
+    return [d for d in detalhes if (d.startswith("SCAN ") and "COVERING INDEX" not in d) or "TEMP B-TREE" in d]
+
+
+def medir_latencia(conn, sql, parametros=None, repeticoes=5):
+    conn.execute(sql, parametros or {}).fetchall()  # aquece o cache de páginas
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        conn.execute(sql, parametros or {}).fetchall()
+        tempos.append(time.perf_counter() - inicio)
+    return statistics.median(tempos)
+
+
+def colunas_da_tabela(conn, tabela):
+    return [linha[1] for linha in conn.execute(f"PRAGMA table_info({tabela})")]
+
+
+def propor_indices(conn, sql):
+    # Para cada tabela da consulta, um índice com as colunas comparadas com constantes,
+    # depois as de junção e por fim as demais colunas usadas (para cobrir a consulta)
+    apelidos = {}
+    for tabela, apelido in re.findall(r"(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", sql, re.I):
+        apelidos[tabela] = tabela
+        if apelido and apelido.upper() not in PALAVRAS_RESERVADAS:
+            apelidos[apelido] = tabela
+
+    tabelas = set(apelidos.values())
+    colunas = {t: colunas_da_tabela(conn, t) for t in tabelas}
+
+    def resolver(referencia):
+        if "." in referencia:
+            apelido, coluna = referencia.split(".", 1)
+            tabela = apelidos.get(apelido)
+            return (tabela, coluna) if tabela and coluna in colunas[tabela] else None
+        donos = [t for t in tabelas if referencia in colunas[t]]
+        return (donos[0], referencia) if len(donos) == 1 else None
+
+    sem_literais = re.sub(r"'[^']*'|:\w+", "''", sql)
+    usadas, constantes, juncoes = {}, set(), set()
+    for referencia in re.findall(r"\b\w+(?:\.\w+)?\b", sem_literais):
+        resolvida = resolver(referencia)
+        if resolvida:
+            usadas.setdefault(resolvida[0], []).append(resolvida[1])
+    for esquerda, direita in re.findall(r"([\w.]+)\s*=\s*('[^']*'|:\w+|[\w.]+)", sql):
+        lado_esquerdo = resolver(esquerda)
+        if direita.startswith(("'", ":")):
+            if lado_esquerdo:
+                constantes.add(lado_esquerdo)
+            continue
+        for lado in (lado_esquerdo, resolver(direita)):
+            if lado:
+                juncoes.add(lado)
+
+    propostas = []
+    for tabela, cols in usadas.items():
+        cols = list(dict.fromkeys(cols))
+        ordem = (
+            [c for c in cols if (tabela, c) in constantes]
+            + [c for c in cols if (tabela, c) in juncoes and (tabela, c) not in constantes]
+            + [c for c in cols if (tabela, c) not in constantes and (tabela, c) not in juncoes]
+        )
+        propostas.append((tabela, tuple(ordem)))
+    return propostas
+
+
+def indices_existentes(conn, tabela):
+    # Colunas de cada índice já existente na tabela (inclui os automáticos das chaves)
+    return [
+        tuple(info[2] for info in conn.execute(f"PRAGMA index_info({indice[1]})"))
+        for indice in conn.execute(f"PRAGMA index_list({tabela})")
+    ]
+
+
+def redundante(colunas, outros):
+    # Um índice é dispensável se suas colunas são prefixo de outro índice da mesma tabela
+    return any(outro[:len(colunas)] == colunas for outro in outros if outro != colunas)
+
+
+def melhorou(antes, depois):
+    return antes - depois > max(antes * GANHO_MINIMO, VARIACAO_MINIMA)
+
+
+def piorou(antes, depois):
+    return depois - antes > max(antes * GANHO_MINIMO, VARIACAO_MINIMA)
+
+
+def medir_consultas(conn, consultas, candidatos):
+    # nome -> (latência, candidatos que aparecem no plano da consulta)
+    medidas = {}
+    for nome, (sql, parametros) in consultas.items():
+        detalhes = plano_da_consulta(conn, sql, parametros)
+        usados = {n for n in candidatos if any(f"INDEX {n} " in d + " " for d in detalhes)}
+        medidas[nome] = (medir_latencia(conn, sql, parametros), usados)
+    return medidas
+
+
+def motivo_rejeicao(indice, antes, medidas):
+    # None se as consultas que usam o índice ficaram, somadas, mais rápidas além do ruído
+    # e nenhuma delas piorou; senão, o motivo para descartá-lo
+    afetadas = [nome for nome, (_, usados) in medidas.items() if indice in usados]
+    if not afetadas:
+        return "não usado pelo planejador"
+    pioradas = [nome for nome in afetadas if piorou(antes[nome], medidas[nome][0])]
+    if pioradas:
+        return "piorou " + ", ".join(f"{nome} ({antes[nome] * 1000:.1f} -> {medidas[nome][0] * 1000:.1f} ms)"
+                                     for nome in pioradas)
+    soma_antes = sum(antes[nome] for nome in afetadas)
+    soma_depois = sum(medidas[nome][0] for nome in afetadas)
+    if not melhorou(soma_antes, soma_depois):
+        return f"sem ganho ({soma_antes * 1000:.1f} -> {soma_depois * 1000:.1f} ms nas consultas que o usam)"
+    return None
+
+
+def nome_indice(tabela, colunas):
+    return f"idx_cov_{tabela.lower()}_{'_'.join(colunas)}"[:60]
+
+
+def ddl_indice(tabela, colunas):
+    return f"CREATE INDEX IF NOT EXISTS {nome_indice(tabela, colunas)} ON {tabela}({', '.join(colunas)});"
+
+
+def analisar(caminho_db="vacinacao.db", aplicar=False, caminho_indices="indices.sql"):
+    conn = sqlite3.connect(caminho_db)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'AplicacaoFato'").fetchone():
+        print("Banco no esquema compacto: as consultas usam views; ajuste indices_compacto.sql manualmente.")
+        conn.close()
+        return []
+
+    consultas = consultas_registradas()
+    antes = {}
+    for nome, (sql, parametros) in consultas.items():
+        detalhes = plano_da_consulta(conn, sql, parametros)
+        antes[nome] = medir_latencia(conn, sql, parametros)
+        print(f"\n{nome}: {antes[nome] * 1000:.1f} ms")
+        for problema in problemas_do_plano(detalhes):
+            print(f"  ! {problema}")
+
+    # Cria os candidatos que não são cobertos por outro índice e deixa o planejador escolher
+    propostas = {}
+    for sql, _ in consultas.values():
+        for tabela, colunas in propor_indices(conn, sql):
+            propostas.setdefault(tabela, set()).add(colunas)
+    candidatos = {}
+    for tabela, conjunto in propostas.items():
+        existentes = indices_existentes(conn, tabela)
+        for colunas in sorted(conjunto):
+            if colunas not in existentes and not redundante(colunas, existentes + list(conjunto)):
+                candidatos[nome_indice(tabela, colunas)] = (tabela, colunas)
+    for tabela, colunas in candidatos.values():
+        conn.execute(ddl_indice(tabela, colunas))
+    conn.execute("ANALYZE")
+
+    # Remove os candidatos sem ganho medido e mede de novo, já que sem eles os planos
+    # podem mudar, até sobrarem só índices que se pagam
+    ativos = dict(candidatos)
+    rejeitados = {}
+    rodada = 1
+    while ativos:
+        medidas = medir_consultas(conn, consultas, ativos)
+        print(f"\nCom os índices candidatos (rodada {rodada}, {len(ativos)} índices):")
+        for nome, (depois, _) in medidas.items():
+            print(f"  {nome}: {antes[nome] * 1000:.1f} ms -> {depois * 1000:.1f} ms")
+        novos = {n: motivo for n in ativos if (motivo := motivo_rejeicao(n, antes, medidas))}
+        if not novos:
+            break
+        for nome in novos:
+            conn.execute(f"DROP INDEX IF EXISTS {nome}")
+            del ativos[nome]
+        conn.execute("ANALYZE")
+        rejeitados.update(novos)
+        rodada += 1
+
+    escolhidos = list(ativos.values())
+    if not aplicar:
+        for nome in ativos:
+            conn.execute(f"DROP INDEX IF EXISTS {nome}")
+    conn.commit()
+    conn.close()
+
+    print("\nÍndices escolhidos:")
+    for tabela, colunas in escolhidos:
+        print(f"  {ddl_indice(tabela, colunas)}")
+    if rejeitados:
+        print("\nÍndices rejeitados:")
+        for nome, motivo in rejeitados.items():
+            print(f"  {ddl_indice(*candidatos[nome])}  -- {motivo}")
+
+    if aplicar and escolhidos:
+        gravar_indices(escolhidos, caminho_indices)
+    return escolhidos
+
+
+def gravar_indices(escolhidos, caminho_indices="indices.sql"):
+    # Mantém os índices escritos à mão e acrescenta os escolhidos à seção gerada pelo consultor
+    try:
+        with open(caminho_indices, "r", encoding="utf-8") as f:
+            manual, _, gerados = f.read().partition(MARCADOR_CONSULTOR)
+    except FileNotFoundError:
+        manual, gerados = CABECALHO_INDICES, ""
+    linhas_geradas = [linha for linha in gerados.splitlines() if linha.strip()]
+    for tabela, colunas in escolhidos:
+        if ddl_indice(tabela, colunas) not in linhas_geradas:
+            linhas_geradas.append(ddl_indice(tabela, colunas))
+    with open(caminho_indices, "w", encoding="utf-8") as f:
+        f.write("\n".join([manual.rstrip("\n"), "", MARCADOR_CONSULTOR, ""] + linhas_geradas) + "\n")
+    print(f"\n'{caminho_indices}' atualizado com {len(escolhidos)} índices.")
+
+
+if __name__ == "__main__":
+    argumentos = [a for a in sys.argv[1:] if not a.startswith("--")]
+    analisar(argumentos[0] if argumentos else "vacinacao.db", aplicar="--aplicar" in sys.argv)
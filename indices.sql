@@ -0,0 +1,11 @@
+-- Índices secundários, criados por criar_indices depois que os dados já foram carregados
+
+CREATE INDEX IF NOT EXISTS idx_aplicacao_paciente ON Aplicacao(paciente_fk);
+CREATE INDEX IF NOT EXISTS idx_estabelecimento_municipio ON Estabelecimento(municipio_fk);
+
+-- Índices de cobertura propostos por consultor_indices.py
+
+CREATE INDEX IF NOT EXISTS idx_cov_paciente_id_idade ON Paciente(id, idade);
+CREATE INDEX IF NOT EXISTS idx_cov_aplicacao_estabelecimento_fk_data_aplicacao ON Aplicacao(estabelecimento_fk, data_aplicacao);
+CREATE INDEX IF NOT EXISTS idx_cov_municipio_nome_codigo ON Municipio(nome, codigo);
+CREATE INDEX IF NOT EXISTS idx_cov_aplicacao_local_aplicacao_fk_estabelecimento_fk ON Aplicacao(local_aplicacao_fk, estabelecimento_fk);
@@ -0,0 +1,13 @@
+-- Índices secundários do esquema compacto, criados por criar_indices depois da carga
+
+CREATE INDEX IF NOT EXISTS idx_estabelecimentodim_municipio ON EstabelecimentoDim(municipio_id);
+
+-- Equivalentes aos índices de cobertura do indices.sql, com dia/dia_semana no lugar
+-- de data_aplicacao (ver consultas.montar_consulta com compacto=True)
+
+CREATE INDEX IF NOT EXISTS idx_cov_pacientedim_id_idade ON PacienteDim(id, idade);
+CREATE INDEX IF NOT EXISTS idx_cov_aplicacaofato_paciente_dia ON AplicacaoFato(paciente_id, dia);
+-- Cobre as Consultas 1, 2 e 4 quando os filtros de município/UF começam a junção pelo estabelecimento
+CREATE INDEX IF NOT EXISTS idx_cov_aplicacaofato_estabelecimento_dia ON AplicacaoFato(estabelecimento_id, dia, dia_semana, local_aplicacao_id, paciente_id);
+CREATE INDEX IF NOT EXISTS idx_cov_municipiodim_nome_id_uf ON MunicipioDim(nome, id, uf_id);
+CREATE INDEX IF NOT EXISTS idx_cov_aplicacaofato_local_aplicacao_estabelecimento_dia ON AplicacaoFato(local_aplicacao_id, estabelecimento_id, dia);
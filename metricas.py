@@ -0,0 +1,184 @@
+# metricas.py
+#
+# Métricas de execução gravadas em um arquivo SQLite local (metricas.db) e exibidas na
+# página de administração do painel (pages/administracao.py):
+#   - coleta: latência, bytes, status e tentativas de cada página da API;
+#   - carga: tempo e memória de cada etapa e linhas/s de cada tabela;
+#   - painel: tempo, linhas, acerto no cache e plano (EXPLAIN QUERY PLAN) de cada consulta.
+# Todas as linhas de um mesmo processo levam o mesmo identificador de execução. Ao abrir
+# o arquivo, cada processo apaga as linhas com mais de DIAS_RETENCAO dias.
+
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+CAMINHO_METRICAS = "metricas.db"
+DIAS_RETENCAO = 30
+TABELAS_METRICAS = ("MetricaPagina", "MetricaEtapa", "MetricaTabela", "MetricaConsulta")
+
+ESQUEMA = """
+CREATE TABLE IF NOT EXISTS MetricaPagina (
+    execucao TEXT NOT NULL,
+    registrado_em TEXT NOT NULL,
+    pagina INTEGER,
+    segundos REAL,
+    bytes INTEGER,
+    status TEXT,
+    tentativa INTEGER,
+    registros INTEGER
+);
+CREATE TABLE IF NOT EXISTS MetricaEtapa (
+    execucao TEXT NOT NULL,
+    registrado_em TEXT NOT NULL,
+    etapa TEXT NOT NULL,
+    segundos REAL,
+    rss_inicio_mb REAL,
+    rss_fim_mb REAL,
+    pico_rss_mb REAL
+);
+CREATE TABLE IF NOT EXISTS MetricaTabela (
+    execucao TEXT NOT NULL,
+    registrado_em TEXT NOT NULL,
+    tabela TEXT NOT NULL,
+    linhas INTEGER,
+    segundos REAL,
+    linhas_por_s REAL
+);
+CREATE TABLE IF NOT EXISTS MetricaConsulta (
+    execucao TEXT NOT NULL,
+    registrado_em TEXT NOT NULL,
+    consulta TEXT NOT NULL,
+    parametros TEXT,
+    segundos REAL,
+    linhas INTEGER,
+    cache TEXT,
+    plano TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_metricapagina_execucao ON MetricaPagina(execucao);
+CREATE INDEX IF NOT EXISTS idx_metricaetapa_execucao ON MetricaEtapa(execucao);
+CREATE INDEX IF NOT EXISTS idx_metricatabela_execucao ON MetricaTabela(execucao);
+CREATE INDEX IF NOT EXISTS idx_metricaconsulta_registrado_em ON MetricaConsulta(registrado_em);
+"""
+
+EXECUCAO = f"{datetime.now():%Y%m%d-%H%M%S}-{os.getpid()}"
+
+_caminho = CAMINHO_METRICAS
+_abertas = {}
+_lock = threading.Lock()
+
+
+def configurar(caminho, execucao=None):
+    # Troca o arquivo de métricas do processo; None desliga a gravação. `execucao` deixa
+    # um processo auxiliar (ex.: carga de uma partição) gravar na execução de quem o criou.
+    global _caminho, EXECUCAO
+    _caminho = caminho
+    if execucao is not None:
+        EXECUCAO = execucao
+
+
+def configuracao():
+    # (caminho, execucao) para repassar a configurar() em outro processo
+    return _caminho, EXECUCAO
+
+
+def pico_memoria_mb():
+    # Pico de memória residente (RSS) do processo; None onde o módulo resource não existe
+    if resource is None:
+        return None
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return pico / 1024 / 1024 if sys.platform == "darwin" else pico / 1024
+
+
+def memoria_atual_mb():
+    # RSS atual (Linux); None nos outros sistemas
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 / 1024
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def conexao():
+    # Uma conexão por arquivo no processo, compartilhada pelas threads (as da coleta e as
+    # de cada execução do script no Streamlit) e usada sempre com _lock adquirido
+    conn = _abertas.get(_caminho)
+    if conn is None:
+        conn = sqlite3.connect(_caminho, timeout=5, isolation_level=None, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.executescript(ESQUEMA)
+        apagar_antigas(conn)
+        _abertas[_caminho] = conn
+    return conn
+
+
+def apagar_antigas(conn, dias=None):
+    # Retenção: sem ela as tabelas (e as consultas da página de administração) crescem a
+    # cada consulta do painel e a cada página coletada
+    limite = datetime.now() - timedelta(days=DIAS_RETENCAO if dias is None else dias)
+    for tabela in TABELAS_METRICAS:
+        conn.execute(f"DELETE FROM {tabela} WHERE registrado_em < ?", (limite.isoformat(timespec="milliseconds"),))
+
+
+def _gravar(tabela, valores):
+    if _caminho is None:
+        return
+    valores = {"execucao": EXECUCAO, "registrado_em": datetime.now().isoformat(timespec="milliseconds"), **valores}
+    try:
+        with _lock:
+            conexao().execute(
+                f"INSERT INTO {tabela} ({', '.join(valores)}) VALUES ({', '.join('?' * len(valores))})",
+                list(valores.values())
+            )
+    except sqlite3.Error as e:
+        # Métrica perdida não deve derrubar a carga nem o painel
+        print(f"AVISO: métrica não registrada em {tabela}: {e}")
+
+
+def registrar_pagina(pagina, segundos, bytes_recebidos=None, status=None, tentativa=1, registros=None):
+    _gravar("MetricaPagina", {"pagina": pagina, "segundos": segundos, "bytes": bytes_recebidos,
+                              "status": None if status is None else str(status), "tentativa": tentativa,
+                              "registros": registros})
+
+
+def registrar_tabelas(estatisticas):
+    # `estatisticas` no formato de carregar_bloco: {tabela: [linhas, segundos]}
+    for tabela, (linhas, segundos) in estatisticas.items():
+        _gravar("MetricaTabela", {"tabela": tabela, "linhas": linhas, "segundos": segundos,
+                                  "linhas_por_s": linhas / segundos if segundos else None})
+
+
+def registrar_consulta(consulta, parametros, segundos, linhas, cache=None, plano=None):
+    _gravar("MetricaConsulta", {"consulta": consulta, "parametros": json.dumps(parametros or {}, ensure_ascii=False),
+                                "segundos": segundos, "linhas": linhas, "cache": cache,
+                                "plano": "\n".join(plano) if plano else None})
+
+
+@contextmanager
+def etapa(nome):
+    # Mede o tempo e a memória do bloco `with`; o pico é o do processo até o fim da etapa
+    rss_inicio = memoria_atual_mb()
+    inicio = time.perf_counter()
+    try:
+        yield
+    finally:
+        _gravar("MetricaEtapa", {"etapa": nome, "segundos": time.perf_counter() - inicio,
+                                 "rss_inicio_mb": rss_inicio, "rss_fim_mb": memoria_atual_mb(),
+                                 "pico_rss_mb": pico_memoria_mb()})
+
+
+def ler(sql, parametros=()):
+    # (colunas, linhas) de uma consulta sobre o arquivo de métricas, para a página de administração
+    with _lock:
+        cursor = conexao().execute(sql, parametros)
+        return [c[0] for c in cursor.description], cursor.fetchall()
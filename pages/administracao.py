@@ -0,0 +1,112 @@
+import streamlit as st
+import pandas as pd
+
+import metricas
+from consultor_indices import problemas_do_plano
+
+LIMIAR_LENTA_MS = 500
+COR_LENTA = "background-color: #f8d7da"
+
+
+def tabela(sql, parametros=()):
+    colunas, linhas = metricas.ler(sql, parametros)
+    return pd.DataFrame(linhas, columns=colunas)
+
+
+def destacar_lentas(df, limiar_ms):
+    return df.style.apply(
+        lambda linha: [COR_LENTA if linha["ms"] > limiar_ms else ""] * len(linha), axis=1
+    ).format({"ms": "{:.1f}"})
+
+
+def secao_consultas():
+    st.header("Consultas do painel")
+    limiar_ms = st.number_input("Considerar lenta acima de (ms)", min_value=1, value=LIMIAR_LENTA_MS, step=50)
+    limite = st.number_input("Execuções analisadas", min_value=10, value=500, step=100)
+
+    df = tabela(
+        "SELECT registrado_em, consulta, parametros, segundos * 1000 AS ms, linhas, cache, plano "
+        "FROM MetricaConsulta ORDER BY registrado_em DESC LIMIT ?",
+        (int(limite),)
+    )
+    if df.empty:
+        st.info("Nenhuma consulta registrada ainda.")
+        return
+
+    resumo = df.groupby("consulta").agg(
+        execucoes=("ms", "size"),
+        mediana_ms=("ms", "median"),
+        p95_ms=("ms", lambda ms: ms.quantile(0.95)),
+        max_ms=("ms", "max"),
+        acertos_cache=("cache", lambda cache: (cache == "acerto").mean()),
+        colunar=("cache", lambda cache: (cache == "colunar").mean()),
+        lentas=("ms", lambda ms: int((ms > limiar_ms).sum())),
+    ).sort_values("p95_ms", ascending=False)
+    st.subheader("Resumo por consulta")
+    st.dataframe(resumo.style.format({"mediana_ms": "{:.1f}", "p95_ms": "{:.1f}", "max_ms": "{:.1f}",
+                                      "acertos_cache": "{:.0%}", "colunar": "{:.0%}"}), use_container_width=True)
+
+    st.subheader("Execuções recentes")
+    st.dataframe(destacar_lentas(df.drop(columns=["plano"]), limiar_ms), use_container_width=True)
+
+    lentas = df[(df["ms"] > limiar_ms) & df["plano"].notna()]
+    st.subheader(f"Planos das consultas lentas ({len(lentas)})")
+    for _, linha in lentas.head(20).iterrows():
+        with st.expander(f"{linha['registrado_em']} — {linha['consulta']} ({linha['ms']:.0f} ms)"):
+            st.code(linha["plano"])
+            for problema in problemas_do_plano(linha["plano"].splitlines()):
+                st.warning(problema)
+            st.json(linha["parametros"])
+
+
+def secao_cargas():
+    st.header("Cargas")
+    execucoes = [linha[0] for linha in metricas.ler(
+        "SELECT execucao FROM MetricaEtapa GROUP BY execucao ORDER BY MAX(registrado_em) DESC LIMIT 50"
+    )[1]]
+    if not execucoes:
+        st.info("Nenhuma carga registrada ainda.")
+        return
+    execucao = st.selectbox("Execução", execucoes)
+
+    etapas = tabela(
+        "SELECT etapa, segundos, rss_inicio_mb, rss_fim_mb, pico_rss_mb, registrado_em "
+        "FROM MetricaEtapa WHERE execucao = ? ORDER BY registrado_em", (execucao,)
+    )
+    st.subheader("Etapas")
+    st.dataframe(etapas, use_container_width=True)
+    st.bar_chart(etapas.set_index("etapa")["segundos"])
+
+    tabelas = tabela(
+        "SELECT tabela, linhas, segundos, linhas_por_s FROM MetricaTabela WHERE execucao = ? ORDER BY segundos DESC",
+        (execucao,)
+    )
+    if not tabelas.empty:
+        st.subheader("Tabelas")
+        st.dataframe(tabelas, use_container_width=True)
+
+    paginas = tabela(
+        "SELECT pagina, segundos * 1000 AS ms, bytes, status, tentativa, registros "
+        "FROM MetricaPagina WHERE execucao = ? ORDER BY pagina, tentativa", (execucao,)
+    )
+    if not paginas.empty:
+        st.subheader("Páginas da API")
+        ok = paginas[paginas["status"] == "200"]
+        colunas = st.columns(4)
+        colunas[0].metric("Páginas", len(ok))
+        colunas[1].metric("MB recebidos", f"{paginas['bytes'].sum() / 1024 / 1024:,.1f}")
+        colunas[2].metric("Latência p95 (ms)", f"{ok['ms'].quantile(0.95):,.0f}" if len(ok) else "-")
+        colunas[3].metric("Falhas/repetições", int((paginas["status"] != "200").sum()))
+        st.line_chart(ok.set_index("pagina")["ms"])
+        with st.expander("Todas as requisições"):
+            st.dataframe(paginas, use_container_width=True)
+
+
+def main():
+    st.set_page_config("TP2 - Administração", layout="wide")
+    st.title("Administração — métricas de carga e consultas")
+    secao_consultas()
+    secao_cargas()
+
+
+main()
@@ -0,0 +1,34 @@
+
+-- Tabelas de resumo (agregados materializados) mantidas pela carga e usadas pelo painel
+-- no lugar das consultas sobre a tabela Aplicacao inteira (ver ROTAS_RESUMO em consultas.py).
+-- Chaves ausentes são gravadas como '' para que a restrição UNIQUE funcione.
+
+-- Paciente x Aplicacao, com o município/UF do estabelecimento quando existir
+CREATE TABLE IF NOT EXISTS ResumoFaixaEtaria (
+    faixa_etaria TEXT NOT NULL,
+    municipio_codigo TEXT NOT NULL,
+    municipio_nome TEXT,
+    uf_sigla TEXT,
+    data_aplicacao TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    UNIQUE (faixa_etaria, municipio_codigo, data_aplicacao)
+);
+CREATE INDEX IF NOT EXISTS idx_resumofaixaetaria_municipio ON ResumoFaixaEtaria(municipio_nome, faixa_etaria, total);
+
+-- Aplicacao x Estabelecimento x Municipio; dia_semana como strftime('%w')
+CREATE TABLE IF NOT EXISTS ResumoDiaSemana (
+    dia_semana TEXT NOT NULL,
+    municipio_codigo TEXT NOT NULL,
+    municipio_nome TEXT,
+    uf_sigla TEXT,
+    total INTEGER NOT NULL,
+    UNIQUE (dia_semana, municipio_codigo)
+);
+
+-- Aplicacao x LocalAplicacao
+CREATE TABLE IF NOT EXISTS ResumoLocalAplicacao (
+    local_codigo TEXT NOT NULL,
+    descricao TEXT,
+    total INTEGER NOT NULL,
+    UNIQUE (local_codigo)
+);
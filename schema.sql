@@ -1,28 +1,28 @@
 PRAGMA foreign_keys = ON;
 
-CREATE TABLE RacaCor (codigo TEXT PRIMARY KEY, descricao TEXT);
-CREATE TABLE EtniaIndigena (codigo TEXT PRIMARY KEY, descricao TEXT);
-CREATE TABLE UF (sigla TEXT PRIMARY KEY, nome TEXT);
-CREATE TABLE Municipio (
+CREATE TABLE IF NOT EXISTS RacaCor (codigo TEXT PRIMARY KEY, descricao TEXT);
+CREATE TABLE IF NOT EXISTS EtniaIndigena (codigo TEXT PRIMARY KEY, descricao TEXT);
+CREATE TABLE IF NOT EXISTS UF (sigla TEXT PRIMARY KEY, nome TEXT);
+CREATE TABLE IF NOT EXISTS Municipio (
     codigo TEXT PRIMARY KEY,
     nome TEXT,
     uf_sigla TEXT,
     FOREIGN KEY (uf_sigla) REFERENCES UF(sigla)
 );
-CREATE TABLE Fabricante (codigo TEXT PRIMARY KEY, descricao TEXT);
-CREATE TABLE DoseVacina (codigo TEXT PRIMARY KEY, descricao TEXT);
-CREATE TABLE GrupoAtendimento (codigo TEXT PRIMARY KEY, descricao TEXT);
-CREATE TABLE CategoriaAtendimento (codigo TEXT PRIMARY KEY, descricao TEXT);
-CREATE TABLE TipoEstabelecimento (codigo TEXT PRIMARY KEY, descricao TEXT);
-CREATE TABLE NaturezaEstabelecimento (codigo TEXT PRIMARY KEY, descricao TEXT);
-CREATE TABLE LocalAplicacao (codigo TEXT PRIMARY KEY, descricao TEXT);
-CREATE TABLE ViaAdministracao (codigo TEXT PRIMARY KEY, descricao TEXT);
-CREATE TABLE EstrategiaVacinacao (codigo TEXT PRIMARY KEY, descricao TEXT);
-CREATE TABLE CondicaoMaternal (codigo TEXT PRIMARY KEY, descricao TEXT);
-CREATE TABLE OrigemRegistro (codigo TEXT PRIMARY KEY, descricao TEXT);
-CREATE TABLE SistemaOrigem (codigo TEXT PRIMARY KEY, descricao TEXT);
+CREATE TABLE IF NOT EXISTS Fabricante (codigo TEXT PRIMARY KEY, descricao TEXT);
+CREATE TABLE IF NOT EXISTS DoseVacina (codigo TEXT PRIMARY KEY, descricao TEXT);
+CREATE TABLE IF NOT EXISTS GrupoAtendimento (codigo TEXT PRIMARY KEY, descricao TEXT);
+CREATE TABLE IF NOT EXISTS CategoriaAtendimento (codigo TEXT PRIMARY KEY, descricao TEXT);
+CREATE TABLE IF NOT EXISTS TipoEstabelecimento (codigo TEXT PRIMARY KEY, descricao TEXT);
+CREATE TABLE IF NOT EXISTS NaturezaEstabelecimento (codigo TEXT PRIMARY KEY, descricao TEXT);
+CREATE TABLE IF NOT EXISTS LocalAplicacao (codigo TEXT PRIMARY KEY, descricao TEXT);
+CREATE TABLE IF NOT EXISTS ViaAdministracao (codigo TEXT PRIMARY KEY, descricao TEXT);
+CREATE TABLE IF NOT EXISTS EstrategiaVacinacao (codigo TEXT PRIMARY KEY, descricao TEXT);
+CREATE TABLE IF NOT EXISTS CondicaoMaternal (codigo TEXT PRIMARY KEY, descricao TEXT);
+CREATE TABLE IF NOT EXISTS OrigemRegistro (codigo TEXT PRIMARY KEY, descricao TEXT);
+CREATE TABLE IF NOT EXISTS SistemaOrigem (codigo TEXT PRIMARY KEY, descricao TEXT);
 
-CREATE TABLE Paciente (
+CREATE TABLE IF NOT EXISTS Paciente (
     id TEXT PRIMARY KEY,
     sexo TEXT,
     idade INTEGER,
@@ -36,7 +36,7 @@ CREATE TABLE Paciente (
     FOREIGN KEY (etnia_indigena_fk) REFERENCES EtniaIndigena(codigo)
 );
 
-CREATE TABLE Estabelecimento (
+CREATE TABLE IF NOT EXISTS Estabelecimento (
     id TEXT PRIMARY KEY,
     razao_social TEXT,
     nome_fantasia TEXT,
@@ -48,7 +48,7 @@ CREATE TABLE Estabelecimento (
     FOREIGN KEY (natureza_fk) REFERENCES NaturezaEstabelecimento(codigo)
 );
 
-CREATE TABLE Vacina (
+CREATE TABLE IF NOT EXISTS Vacina (
     id TEXT PRIMARY KEY,
     descricao TEXT,
     sigla TEXT,
@@ -60,7 +60,7 @@ CREATE TABLE Vacina (
     FOREIGN KEY (categoria_atendimento_fk) REFERENCES CategoriaAtendimento(codigo)
 );
 
-CREATE TABLE Aplicacao (
+CREATE TABLE IF NOT EXISTS Aplicacao (
     id TEXT PRIMARY KEY,
     data_aplicacao TEXT,
     lote TEXT,
@@ -86,3 +86,18 @@ CREATE TABLE Aplicacao (
     FOREIGN KEY (origem_registro_fk) REFERENCES OrigemRegistro(codigo),
     FOREIGN KEY (sistema_origem_fk) REFERENCES SistemaOrigem(codigo)
 );
+
+-- Controle da carga incremental: próxima página (offset) a ser buscada na API
+CREATE TABLE IF NOT EXISTS CargaCheckpoint (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    proxima_pagina INTEGER NOT NULL,
+    atualizado_em TEXT
+);
+
+-- Versão da carga: trocada a cada carga concluída (e a cada lote da carga incremental);
+-- faz parte da chave do cache de resultados do painel (cache_resultados.py)
+CREATE TABLE IF NOT EXISTS CargaVersao (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    versao TEXT NOT NULL,
+    atualizado_em TEXT
+);
@@ -0,0 +1,164 @@
+
+-- Esquema compacto (opcional): dimensões com chave substituta INTEGER, fato estreito
+-- e datas como número de dias desde 1970-01-01. As views no final expõem
+-- as mesmas tabelas e colunas do schema.sql, então as consultas existentes continuam
+-- funcionando; nelas as chaves (codigo/id/*_fk) são os ids inteiros, exceto UF.sigla.
+
+PRAGMA foreign_keys = ON;
+
+CREATE TABLE IF NOT EXISTS RacaCorDim (id INTEGER PRIMARY KEY, codigo TEXT NOT NULL UNIQUE, descricao TEXT);
+CREATE TABLE IF NOT EXISTS EtniaIndigenaDim (id INTEGER PRIMARY KEY, codigo TEXT NOT NULL UNIQUE, descricao TEXT);
+CREATE TABLE IF NOT EXISTS UFDim (id INTEGER PRIMARY KEY, codigo TEXT NOT NULL UNIQUE, nome TEXT);
+CREATE TABLE IF NOT EXISTS MunicipioDim (
+    id INTEGER PRIMARY KEY,
+    codigo TEXT NOT NULL UNIQUE,
+    nome TEXT,
+    uf_id INTEGER,
+    FOREIGN KEY (uf_id) REFERENCES UFDim(id)
+);
+CREATE TABLE IF NOT EXISTS FabricanteDim (id INTEGER PRIMARY KEY, codigo TEXT NOT NULL UNIQUE, descricao TEXT);
+CREATE TABLE IF NOT EXISTS DoseVacinaDim (id INTEGER PRIMARY KEY, codigo TEXT NOT NULL UNIQUE, descricao TEXT);
+CREATE TABLE IF NOT EXISTS GrupoAtendimentoDim (id INTEGER PRIMARY KEY, codigo TEXT NOT NULL UNIQUE, descricao TEXT);
+CREATE TABLE IF NOT EXISTS CategoriaAtendimentoDim (id INTEGER PRIMARY KEY, codigo TEXT NOT NULL UNIQUE, descricao TEXT);
+CREATE TABLE IF NOT EXISTS TipoEstabelecimentoDim (id INTEGER PRIMARY KEY, codigo TEXT NOT NULL UNIQUE, descricao TEXT);
+CREATE TABLE IF NOT EXISTS NaturezaEstabelecimentoDim (id INTEGER PRIMARY KEY, codigo TEXT NOT NULL UNIQUE, descricao TEXT);
+CREATE TABLE IF NOT EXISTS LocalAplicacaoDim (id INTEGER PRIMARY KEY, codigo TEXT NOT NULL UNIQUE, descricao TEXT);
+CREATE TABLE IF NOT EXISTS ViaAdministracaoDim (id INTEGER PRIMARY KEY, codigo TEXT NOT NULL UNIQUE, descricao TEXT);
+CREATE TABLE IF NOT EXISTS EstrategiaVacinacaoDim (id INTEGER PRIMARY KEY, codigo TEXT NOT NULL UNIQUE, descricao TEXT);
+CREATE TABLE IF NOT EXISTS CondicaoMaternalDim (id INTEGER PRIMARY KEY, codigo TEXT NOT NULL UNIQUE, descricao TEXT);
+CREATE TABLE IF NOT EXISTS OrigemRegistroDim (id INTEGER PRIMARY KEY, codigo TEXT NOT NULL UNIQUE, descricao TEXT);
+CREATE TABLE IF NOT EXISTS SistemaOrigemDim (id INTEGER PRIMARY KEY, codigo TEXT NOT NULL UNIQUE, descricao TEXT);
+
+CREATE TABLE IF NOT EXISTS PacienteDim (
+    id INTEGER PRIMARY KEY,
+    codigo TEXT NOT NULL UNIQUE,
+    sexo TEXT,
+    idade INTEGER,
+    cep TEXT,
+    nacionalidade TEXT,
+    raca_cor_id INTEGER,
+    municipio_id INTEGER,
+    etnia_indigena_id INTEGER,
+    FOREIGN KEY (raca_cor_id) REFERENCES RacaCorDim(id),
+    FOREIGN KEY (municipio_id) REFERENCES MunicipioDim(id),
+    FOREIGN KEY (etnia_indigena_id) REFERENCES EtniaIndigenaDim(id)
+);
+
+CREATE TABLE IF NOT EXISTS EstabelecimentoDim (
+    id INTEGER PRIMARY KEY,
+    codigo TEXT NOT NULL UNIQUE,
+    razao_social TEXT,
+    nome_fantasia TEXT,
+    municipio_id INTEGER,
+    tipo_id INTEGER,
+    natureza_id INTEGER,
+    FOREIGN KEY (municipio_id) REFERENCES MunicipioDim(id),
+    FOREIGN KEY (tipo_id) REFERENCES TipoEstabelecimentoDim(id),
+    FOREIGN KEY (natureza_id) REFERENCES NaturezaEstabelecimentoDim(id)
+);
+
+CREATE TABLE IF NOT EXISTS VacinaDim (
+    id INTEGER PRIMARY KEY,
+    codigo TEXT NOT NULL UNIQUE,
+    descricao TEXT,
+    sigla TEXT,
+    fabricante_id INTEGER,
+    grupo_atendimento_id INTEGER,
+    categoria_atendimento_id INTEGER,
+    FOREIGN KEY (fabricante_id) REFERENCES FabricanteDim(id),
+    FOREIGN KEY (grupo_atendimento_id) REFERENCES GrupoAtendimentoDim(id),
+    FOREIGN KEY (categoria_atendimento_id) REFERENCES CategoriaAtendimentoDim(id)
+);
+
+-- dia: dias desde 1970-01-01; dia_semana: 0 = domingo (como strftime('%w')); mes: 1-12.
+-- Chave rowid em vez de WITHOUT ROWID: cada índice secundário guarda a chave primária,
+-- e o código do documento (texto longo) repetido em todos eles deixava o arquivo maior
+CREATE TABLE IF NOT EXISTS AplicacaoFato (
+    id INTEGER PRIMARY KEY,
+    codigo TEXT NOT NULL UNIQUE,
+    dia INTEGER,
+    dia_semana INTEGER,
+    mes INTEGER,
+    lote TEXT,
+    status_documento TEXT,
+    paciente_id INTEGER,
+    vacina_id INTEGER,
+    estabelecimento_id INTEGER,
+    dose_id INTEGER,
+    local_aplicacao_id INTEGER,
+    via_administracao_id INTEGER,
+    estrategia_id INTEGER,
+    condicao_maternal_id INTEGER,
+    origem_registro_id INTEGER,
+    sistema_origem_id INTEGER,
+    FOREIGN KEY (paciente_id) REFERENCES PacienteDim(id),
+    FOREIGN KEY (vacina_id) REFERENCES VacinaDim(id),
+    FOREIGN KEY (estabelecimento_id) REFERENCES EstabelecimentoDim(id),
+    FOREIGN KEY (dose_id) REFERENCES DoseVacinaDim(id),
+    FOREIGN KEY (local_aplicacao_id) REFERENCES LocalAplicacaoDim(id),
+    FOREIGN KEY (via_administracao_id) REFERENCES ViaAdministracaoDim(id),
+    FOREIGN KEY (estrategia_id) REFERENCES EstrategiaVacinacaoDim(id),
+    FOREIGN KEY (condicao_maternal_id) REFERENCES CondicaoMaternalDim(id),
+    FOREIGN KEY (origem_registro_id) REFERENCES OrigemRegistroDim(id),
+    FOREIGN KEY (sistema_origem_id) REFERENCES SistemaOrigemDim(id)
+);
+
+-- Controle da carga incremental: próxima página (offset) a ser buscada na API
+CREATE TABLE IF NOT EXISTS CargaCheckpoint (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    proxima_pagina INTEGER NOT NULL,
+    atualizado_em TEXT
+);
+
+-- Versão da carga: trocada a cada carga concluída (e a cada lote da carga incremental);
+-- faz parte da chave do cache de resultados do painel (cache_resultados.py)
+CREATE TABLE IF NOT EXISTS CargaVersao (
+    id INTEGER PRIMARY KEY CHECK (id = 1),
+    versao TEXT NOT NULL,
+    atualizado_em TEXT
+);
+
+-- Views de compatibilidade com o schema.sql
+CREATE VIEW IF NOT EXISTS RacaCor AS SELECT id AS codigo, descricao FROM RacaCorDim;
+CREATE VIEW IF NOT EXISTS EtniaIndigena AS SELECT id AS codigo, descricao FROM EtniaIndigenaDim;
+CREATE VIEW IF NOT EXISTS UF AS SELECT codigo AS sigla, nome FROM UFDim;
+-- Subconsulta em vez de LEFT JOIN: a UF só é buscada quando a consulta usa uf_sigla
+CREATE VIEW IF NOT EXISTS Municipio AS
+    SELECT m.id AS codigo, m.nome, (SELECT u.codigo FROM UFDim AS u WHERE u.id = m.uf_id) AS uf_sigla
+    FROM MunicipioDim AS m;
+CREATE VIEW IF NOT EXISTS Fabricante AS SELECT id AS codigo, descricao FROM FabricanteDim;
+CREATE VIEW IF NOT EXISTS DoseVacina AS SELECT id AS codigo, descricao FROM DoseVacinaDim;
+CREATE VIEW IF NOT EXISTS GrupoAtendimento AS SELECT id AS codigo, descricao FROM GrupoAtendimentoDim;
+CREATE VIEW IF NOT EXISTS CategoriaAtendimento AS SELECT id AS codigo, descricao FROM CategoriaAtendimentoDim;
+CREATE VIEW IF NOT EXISTS TipoEstabelecimento AS SELECT id AS codigo, descricao FROM TipoEstabelecimentoDim;
+CREATE VIEW IF NOT EXISTS NaturezaEstabelecimento AS SELECT id AS codigo, descricao FROM NaturezaEstabelecimentoDim;
+CREATE VIEW IF NOT EXISTS LocalAplicacao AS SELECT id AS codigo, descricao FROM LocalAplicacaoDim;
+CREATE VIEW IF NOT EXISTS ViaAdministracao AS SELECT id AS codigo, descricao FROM ViaAdministracaoDim;
+CREATE VIEW IF NOT EXISTS EstrategiaVacinacao AS SELECT id AS codigo, descricao FROM EstrategiaVacinacaoDim;
+CREATE VIEW IF NOT EXISTS CondicaoMaternal AS SELECT id AS codigo, descricao FROM CondicaoMaternalDim;
+CREATE VIEW IF NOT EXISTS OrigemRegistro AS SELECT id AS codigo, descricao FROM OrigemRegistroDim;
+CREATE VIEW IF NOT EXISTS SistemaOrigem AS SELECT id AS codigo, descricao FROM SistemaOrigemDim;
+
+CREATE VIEW IF NOT EXISTS Paciente AS
+    SELECT id, sexo, idade, cep, nacionalidade,
+           raca_cor_id AS raca_cor_fk, municipio_id AS municipio_fk, etnia_indigena_id AS etnia_indigena_fk
+    FROM PacienteDim;
+
+CREATE VIEW IF NOT EXISTS Estabelecimento AS
+    SELECT id, razao_social, nome_fantasia,
+           municipio_id AS municipio_fk, tipo_id AS tipo_fk, natureza_id AS natureza_fk
+    FROM EstabelecimentoDim;
+
+CREATE VIEW IF NOT EXISTS Vacina AS
+    SELECT id, descricao, sigla, fabricante_id AS fabricante_fk,
+           grupo_atendimento_id AS grupo_atendimento_fk, categoria_atendimento_id AS categoria_atendimento_fk
+    FROM VacinaDim;
+
+CREATE VIEW IF NOT EXISTS Aplicacao AS
+    SELECT codigo AS id, date(dia * 86400, 'unixepoch') AS data_aplicacao, dia, dia_semana, mes,
+           lote, status_documento,
+           paciente_id AS paciente_fk, vacina_id AS vacina_fk, estabelecimento_id AS estabelecimento_fk,
+           dose_id AS dose_fk, local_aplicacao_id AS local_aplicacao_fk, via_administracao_id AS via_administracao_fk,
+           estrategia_id AS estrategia_fk, condicao_maternal_id AS condicao_maternal_fk,
+           origem_registro_id AS origem_registro_fk, sistema_origem_id AS sistema_origem_fk
+    FROM AplicacaoFato;
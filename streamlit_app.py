@@ -1,68 +1,17 @@
+import time
+
 import streamlit as st
-import sqlite3
 import pandas as pd
 
-DB_PATH = "vacinacao.db"
-
-QUERIES = {
-    "Consulta 1 — Cobertura Vacinal por Faixa Etária": """
-        SELECT 
-            CASE 
-                WHEN idade < 12 THEN 'Crianças (0-11)' 
-                WHEN idade BETWEEN 12 AND 17 THEN 'Adolescentes (12-17)'
-                WHEN idade BETWEEN 18 AND 59 THEN 'Adultos (18-59)'
-                WHEN idade >= 60 THEN 'Idosos (60+)' 
-                ELSE 'Não Informado'
-            END AS faixa_etaria,
-            COUNT(*) AS total_aplicacoes
-        FROM Paciente
-        JOIN Aplicacao ON Paciente.id = Aplicacao.paciente_fk
-        GROUP BY faixa_etaria
-        ORDER BY total_aplicacoes DESC;
-    """,
+import metricas
+from cache_resultados import CacheResultados
+from colunar import snapshot_atual
+from consultas import (
+    QUERIES, executar_consulta, executar_consulta_particionada, listar_opcoes, listar_opcoes_particionadas,
+    montar_consulta, particoes_ativas, pasta_particoes_padrao,
+)
 
-    "Consulta 2 — Vacinação por dia da semana": """
-        SELECT 
-            CASE strftime('%w', data_aplicacao)
-                WHEN '0' THEN 'Domingo'
-                WHEN '1' THEN 'Segunda'
-                WHEN '2' THEN 'Terça'
-                WHEN '3' THEN 'Quarta'
-                WHEN '4' THEN 'Quinta'
-                WHEN '5' THEN 'Sexta'
-                WHEN '6' THEN 'Sábado'
-            END AS dia_semana,
-            COUNT(*) AS total_aplicacoes
-        FROM Aplicacao AS a
-        JOIN Estabelecimento AS e ON a.estabelecimento_fk = e.id
-        JOIN Municipio AS m ON e.municipio_fk = m.codigo
-        GROUP BY dia_semana
-        ORDER BY total_aplicacoes DESC;
-    """,
-    "Consulta 3 — Top Municípios com Maior Número de Doses Aplicadas": """
-        SELECT 
-            m.nome AS municipio,
-            COUNT(*) AS total_doses
-        FROM Aplicacao AS a
-        JOIN Estabelecimento AS e ON a.estabelecimento_fk = e.id
-        JOIN Municipio AS m ON e.municipio_fk = m.codigo
-        GROUP BY m.nome
-        ORDER BY total_doses DESC
-        LIMIT 10;
-    """,
-
-    "Consulta 4 — Locais Anatômicos Mais Utilizados": """
-        SELECT 
-            l.descricao AS local_anatomico,
-            COUNT(*) AS total_aplicacoes
-        FROM Aplicacao AS a
-        JOIN LocalAplicacao AS l ON a.local_aplicacao_fk = l.codigo
-        WHERE l.descricao != 'Sem registro no sistema de informação de origem' 
-        GROUP BY l.descricao
-        ORDER BY total_aplicacoes DESC
-        LIMIT 15;
-    """,
-}
+DB_PATH = "vacinacao.db"
 
 DESCRICOES = {
     "Consulta 1 — Cobertura Vacinal por Faixa Etária": "Avalia o alcance da vacinação em diferentes faixas etárias.",
@@ -72,10 +21,58 @@ DESCRICOES = {
 
 }
 
-@st.cache_data(ttl=600)
-def run_query(sql):
-    with sqlite3.connect(DB_PATH) as conn:
-        return pd.read_sql_query(sql, conn)
+TODOS = "Todos"
+
+@st.cache_resource
+def cache_resultados():
+    # Cache em disco compartilhado por todos os processos, invalidado a cada nova carga
+    return CacheResultados()
+
+def run_query(nome, filtros=()):
+    # `filtros` é uma tupla de pares (filtro, valor).
+    # Consultas com tabela de resumo disponível são respondidas por ela.
+    # Com a cópia colunar da última carga (colunar.py) a agregação é feita pelo NumPy,
+    # sem SQLite; sem ela, ou com uma carga em andamento, volta para as consultas SQL.
+    # Com a carga particionada por UF mais recente que o banco único, a consulta roda em
+    # paralelo só nas partições que os filtros alcançam e os totais são somados.
+    # Tempo, linhas, cache e plano de cada execução vão para o metricas.db (ver pages/).
+    inicio = time.perf_counter()
+    particionado = particoes_ativas(DB_PATH)
+    snapshot = None if particionado else snapshot_atual(DB_PATH)
+    resultado = snapshot.consultar(nome, dict(filtros)) if snapshot is not None else None
+    if particionado:
+        info = {}
+        colunas, linhas = executar_consulta_particionada(pasta_particoes_padrao(DB_PATH), nome, dict(filtros),
+                                                         cache=cache_resultados(), info=info)
+    elif resultado is not None:
+        colunas, linhas = resultado
+        info = {"parametros": dict(filtros), "cache": "colunar", "plano": None}
+    else:
+        info = {}
+        colunas, linhas = executar_consulta(DB_PATH, nome, dict(filtros), cache=cache_resultados(), info=info)
+    metricas.registrar_consulta(nome, info["parametros"], time.perf_counter() - inicio, len(linhas),
+                                info["cache"], info["plano"])
+    return pd.DataFrame(linhas, columns=colunas)
+
+def opcoes_filtro(filtro):
+    if particoes_ativas(DB_PATH):
+        return listar_opcoes_particionadas(pasta_particoes_padrao(DB_PATH), filtro, cache=cache_resultados())
+    return listar_opcoes(DB_PATH, filtro, cache=cache_resultados())
+
+def escolher_filtros():
+    st.sidebar.title("Filtros")
+    filtros = {
+        "municipio": st.sidebar.selectbox("Município", [TODOS] + opcoes_filtro("municipio"), key="filtro_municipio"),
+        "uf": st.sidebar.selectbox("UF", [TODOS] + opcoes_filtro("uf"), key="filtro_uf"),
+        "vacina": st.sidebar.selectbox("Vacina", [TODOS] + opcoes_filtro("vacina"), key="filtro_vacina"),
+        "data_inicio": st.sidebar.date_input("A partir de", value=None, key="filtro_data_inicio"),
+        "data_fim": st.sidebar.date_input("Até", value=None, key="filtro_data_fim"),
+    }
+    return {
+        filtro: valor.isoformat() if hasattr(valor, "isoformat") else valor
+        for filtro, valor in filtros.items()
+        if valor not in (None, TODOS)
+    }
 
 CONSULTAS_COM_GRAFICO = {
     "Consulta 1 — Cobertura Vacinal por Faixa Etária": "bar_chart",
@@ -156,7 +153,8 @@ def main():
     # Usando uma chave única para o selectbox
     st.sidebar.title("Escolha a Consulta")
     opcao = st.sidebar.selectbox("Consulta", list(QUERIES.keys()), key="consulta_selectbox")
-    sql_base = QUERIES[opcao]
+    filtros = escolher_filtros()
+    sql_base, parametros = montar_consulta(opcao, filtros)
 
     st.title("Doses Aplicadas pelo Programa Nacional de Imunizações (PNI) em 2025")
     st.markdown(f"**Objetivo:** {DESCRICOES.get(opcao, 'Descrição não disponível.')}")
@@ -164,6 +162,8 @@ def main():
     st.subheader(opcao)
     with st.expander("📝Código SQL ", expanded=True):
         st.code(sql_base, language="sql")
+        if parametros:
+            st.json(parametros)
 
     if "mostrar_consulta" not in st.session_state:
         st.session_state.mostrar_consulta = False
@@ -176,54 +176,7 @@ def main():
 
     if st.session_state.mostrar_consulta:
 
-        sql = sql_base  # padrão
-
-        # Filtro de BH aplicado em consultas específicas
-        if opcao == "Consulta 1 — Cobertura Vacinal por Faixa Etária":
-            filtrar_bh = st.checkbox("Filtrar em BH")
-            if filtrar_bh:
-                sql = """
-                    SELECT 
-                        CASE 
-                            WHEN idade < 12 THEN 'Crianças (0-11)' 
-                            WHEN idade BETWEEN 12 AND 17 THEN 'Adolescentes (12-17)'
-                            WHEN idade BETWEEN 18 AND 59 THEN 'Adultos (18-59)'
-                            WHEN idade >= 60 THEN 'Idosos (60+)' 
-                            ELSE 'Não Informado'
-                        END AS faixa_etaria,
-                        COUNT(*) AS total_aplicacoes
-                    FROM Paciente
-                    JOIN Aplicacao ON Paciente.id = Aplicacao.paciente_fk
-                    JOIN Estabelecimento AS e ON Aplicacao.estabelecimento_fk = e.id
-                    JOIN Municipio AS m ON e.municipio_fk = m.codigo
-                    WHERE m.nome = 'BELO HORIZONTE'
-                    GROUP BY faixa_etaria
-                    ORDER BY total_aplicacoes DESC;
-                """
-        elif opcao == "Consulta 2 — Vacinação por dia da semana":
-            filtrar_bh = st.checkbox("Filtrar em BH")
-            if filtrar_bh:
-                sql = """
-                    SELECT 
-                        CASE strftime('%w', data_aplicacao)
-                            WHEN '0' THEN 'Domingo'
-                            WHEN '1' THEN 'Segunda'
-                            WHEN '2' THEN 'Terça'
-                            WHEN '3' THEN 'Quarta'
-                            WHEN '4' THEN 'Quinta'
-                            WHEN '5' THEN 'Sexta'
-                            WHEN '6' THEN 'Sábado'
-                        END AS dia_semana,
-                        COUNT(*) AS total_aplicacoes
-                    FROM Aplicacao AS a
-                    JOIN Estabelecimento AS e ON a.estabelecimento_fk = e.id
-                    JOIN Municipio AS m ON e.municipio_fk = m.codigo
-                    WHERE m.nome = 'BELO HORIZONTE'
-                    GROUP BY dia_semana
-                    ORDER BY total_aplicacoes DESC;
-                """
-
-        df = run_query(sql)
+        df = run_query(opcao, tuple(sorted(parametros.items())))
         st.dataframe(df, use_container_width=True)
 
         if opcao in CONSULTAS_COM_GRAFICO and df.shape[1] >= 2:
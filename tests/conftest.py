@@ -0,0 +1,58 @@
+import json
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlparse
+
+import pytest
+
+RAIZ = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(RAIZ))
+
+import metricas  # noqa: E402
+
+
+@pytest.fixture(autouse=True)
+def ambiente(monkeypatch):
+    # Os arquivos .sql são lidos pelo caminho relativo; as métricas não são gravadas
+    monkeypatch.chdir(RAIZ)
+    metricas.configurar(None)
+
+
+@pytest.fixture
+def api_local():
+    # Servidor HTTP local no formato da API. `respostas` é uma função
+    # (pagina, tentativa) -> (status, corpo em bytes) ou (status, lista de registros).
+    servidores = []
+
+    def iniciar(respostas):
+        tentativas = {}
+        lock = threading.Lock()
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                pagina = int(parse_qs(urlparse(self.path).query)["offset"][0])
+                with lock:
+                    tentativas[pagina] = tentativas.get(pagina, 0) + 1
+                    tentativa = tentativas[pagina]
+                status, corpo = respostas(pagina, tentativa)
+                if not isinstance(corpo, bytes):
+                    corpo = json.dumps({"doses_aplicadas_pni": corpo}).encode()
+                self.send_response(status)
+                self.send_header("Content-Length", str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+        servidor = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=servidor.serve_forever, daemon=True).start()
+        servidores.append(servidor)
+        return f"http://127.0.0.1:{servidor.server_port}/", tentativas
+
+    yield iniciar
+    for servidor in servidores:
+        servidor.shutdown()
+        servidor.server_close()
@@ -0,0 +1,14 @@
+# Registros mínimos no formato da API, com os campos que as consultas do painel usam
+
+
+def registro(documento, paciente="p1", idade=30, estabelecimento="e1", municipio="1", uf="MG",
+             data="2025-03-03", vacina="1", local="1"):
+    return {
+        "codigo_documento": documento, "data_vacina": data, "status_documento": "final",
+        "codigo_paciente": paciente, "numero_idade_paciente": idade,
+        "codigo_cnes_estabelecimento": estabelecimento, "codigo_municipio_estabelecimento": municipio,
+        "nome_municipio_estabelecimento": f"Município {municipio}", "sigla_uf_estabelecimento": uf,
+        "nome_uf_estabelecimento": uf,
+        "codigo_vacina": vacina, "descricao_vacina": f"Vacina {vacina}",
+        "codigo_local_aplicacao": local, "descricao_local_aplicacao": f"Local {local}",
+    }
@@ -0,0 +1,68 @@
+import itertools
+import json
+import sqlite3
+from types import SimpleNamespace
+
+import cache_resultados
+import consultas
+import tp2_extracao_carga as etl
+from cache_resultados import CAMINHO_CACHE, CacheResultados
+from dados import registro
+
+
+def criar_banco(caminho_db):
+    with sqlite3.connect(caminho_db) as conn:
+        with open("schema.sql", "r", encoding="utf-8") as f:
+            conn.executescript(f.read())
+        etl.registrar_versao_carga(conn)
+    conn.close()
+
+
+def test_aquecer_cache_grava_na_pasta_do_banco(tmp_path, monkeypatch):
+    caminho_db = str(tmp_path / "vacinacao.db")
+    criar_banco(caminho_db)
+    (tmp_path / "outra").mkdir()
+    monkeypatch.chdir(tmp_path / "outra")
+    consultas.aquecer_cache(caminho_db)
+    assert (tmp_path / CAMINHO_CACHE).exists()
+    assert not (tmp_path / "outra" / CAMINHO_CACHE).exists()
+
+
+def test_despejo_mantem_os_resultados_usados_mais_recentemente(tmp_path, monkeypatch):
+    relogio = itertools.count()
+    monkeypatch.setattr(cache_resultados, "time", SimpleNamespace(time=lambda: next(relogio)))
+    linhas = [("x" * 100,)]
+    tamanho = len(json.dumps(["c"])) + len(json.dumps(linhas))
+    cache = CacheResultados(str(tmp_path / "cache.db"), limite_bytes=2 * tamanho)
+
+    cache.gravar("a", "v1", ["c"], linhas)
+    cache.gravar("b", "v1", ["c"], linhas)
+    assert cache.obter("a") is not None  # "a" passa a ser o mais recente
+    cache.gravar("c", "v1", ["c"], linhas)
+
+    assert cache.obter("b") is None
+    assert cache.obter("a") == (["c"], linhas)
+    assert cache.obter("c") == (["c"], linhas)
+    total, = cache.conexao().execute("SELECT SUM(tamanho) FROM Resultado").fetchone()
+    assert total <= cache.limite_bytes
+
+
+def test_nova_versao_da_carga_invalida_o_cache(tmp_path):
+    caminho_db = str(tmp_path / "vacinacao.db")
+    etl.criar_banco_e_popular(etl.tabela_enxuta([registro("d1"), registro("d2")]), caminho_db)
+    cache = CacheResultados(str(tmp_path / "cache_teste.db"))
+    nome = "Consulta 3 — Top Municípios com Maior Número de Doses Aplicadas"
+
+    respostas = []
+    for _ in range(2):
+        info = {}
+        respostas.append((consultas.executar_consulta(caminho_db, nome, cache=cache, info=info)[1], info["cache"]))
+    assert [cache for _, cache in respostas] == ["falha", "acerto"]
+    assert respostas[0][0] == respostas[1][0]
+
+    # A carga grava uma nova CargaVersao: o resultado antigo deixa de ser usado
+    etl.criar_banco_e_popular(etl.tabela_enxuta([registro("d3")]), caminho_db, incremental=True)
+    info = {}
+    _, linhas = consultas.executar_consulta(caminho_db, nome, cache=cache, info=info)
+    assert info["cache"] == "falha"
+    assert linhas != respostas[0][0] and sum(linha[-1] for linha in linhas) == 3
@@ -0,0 +1,70 @@
+import json
+import sqlite3
+
+import pandas as pd
+
+import tp2_extracao_carga as etl
+from dados import registro
+
+
+def test_carga_completa_grava_checkpoint_para_a_incremental(api_local, tmp_path, monkeypatch):
+    monkeypatch.setattr(etl, "LIMITE_POR_PAGINA", 2)
+
+    def respostas(pagina, tentativa):
+        quantidade = {0: 2, 1: 2, 2: 2, 3: 1}.get(pagina, 0)
+        return 200, [registro(f"{pagina}-{i}") for i in range(quantidade)]
+
+    url, tentativas = api_local(respostas)
+    spool = tmp_path / "spool.ndjson.gz"
+    caminho_db = tmp_path / "vacinacao.db"
+    total, proxima_pagina = etl.coletar_para_spool(spool, max_paginas=10, workers=2, taxa_por_segundo=None, base_url=url)
+    assert (total, proxima_pagina) == (7, 3)
+
+    etl.criar_banco_e_popular(etl.ler_spool_em_blocos(spool, enxuto=True), str(caminho_db), proxima_pagina=proxima_pagina)
+    with sqlite3.connect(caminho_db) as conn:
+        assert etl.ler_checkpoint(conn) == 3
+
+    # A incremental retoma na página incompleta, sem baixar de novo as anteriores
+    tentativas.clear()
+    etl.carga_incremental(str(caminho_db), max_paginas=1, workers=2, taxa_por_segundo=None, base_url=url)
+    assert set(tentativas) == {3}
+
+
+def test_carga_incremental_grava_com_fsync(api_local, tmp_path, monkeypatch):
+    url, _ = api_local(lambda pagina, tentativa: (200, [registro(f"{pagina}-0")] if pagina == 0 else []))
+    caminho_db = str(tmp_path / "vacinacao.db")
+    etl.criar_banco_e_popular(etl.tabela_enxuta([registro("x")]), caminho_db)
+
+    # synchronous = OFF pode corromper um banco já populado numa queda do sistema
+    modos = []
+    salvar_checkpoint = etl.salvar_checkpoint
+
+    def salvar_e_anotar(conn, proxima_pagina):
+        modos.append(conn.execute("PRAGMA synchronous").fetchone()[0])
+        salvar_checkpoint(conn, proxima_pagina)
+
+    monkeypatch.setattr(etl, "salvar_checkpoint", salvar_e_anotar)
+    etl.carga_incremental(caminho_db, max_paginas=1, workers=1, taxa_por_segundo=None, base_url=url)
+    assert modos and all(modo == 1 for modo in modos)  # NORMAL
+
+
+def test_unificar_enxuto_le_o_json_em_blocos_sem_mudar_o_resultado(tmp_path):
+    registros = [registro(f"d{i}", paciente=f"p{i % 7}", idade=i % 90, uf=["MG", "SP", "RJ"][i % 3]) for i in range(25)]
+    registros[4]["numero_idade_paciente"] = None
+    caminho_json = tmp_path / "dados.json"
+    caminho_json.write_text(json.dumps(registros, ensure_ascii=False, indent=2), encoding="utf-8")
+
+    # Pedaços de leitura menores que um registro e blocos pequenos forçam a junção entre blocos
+    assert list(etl.iterar_registros_json(caminho_json, tamanho_leitura=64)) == registros
+    tabela = etl.unificar_jsons_em_tabela(str(caminho_json), enxuto=True, tamanho_bloco=4)
+
+    esperado = etl.tabela_enxuta(registros)
+    pd.testing.assert_frame_equal(tabela, esperado, check_categorical=False)
+    assert [type(t) for t in tabela.dtypes] == [type(t) for t in esperado.dtypes]
+
+
+def test_unificar_enxuto_de_lista_vazia(tmp_path):
+    caminho_json = tmp_path / "dados.json"
+    caminho_json.write_text("[ ]", encoding="utf-8")
+    tabela = etl.unificar_jsons_em_tabela(str(caminho_json), enxuto=True)
+    assert tabela.empty and list(tabela.columns) == etl.COLUNAS_USADAS
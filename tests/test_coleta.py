@@ -0,0 +1,54 @@
+import random
+import time
+
+from tp2_extracao_carga import iterar_paginas
+
+
+def registros(pagina, quantidade=3):
+    return [{"codigo_documento": f"{pagina}-{i}"} for i in range(quantidade)]
+
+
+def coletar(url, max_paginas=20, workers=4):
+    return list(iterar_paginas(max_paginas, workers=workers, taxa_por_segundo=None, base_url=url))
+
+
+def test_paginas_em_ordem_mesmo_com_respostas_fora_de_ordem(api_local):
+    atrasos = random.Random(0)
+
+    def respostas(pagina, tentativa):
+        time.sleep(atrasos.random() / 20)
+        return 200, registros(pagina) if pagina < 12 else []
+
+    url, _ = api_local(respostas)
+    paginas = coletar(url)
+    assert [pagina for pagina, _ in paginas] == list(range(12))
+    assert all(dados == registros(pagina) for pagina, dados in paginas)
+
+
+def test_repete_503_e_json_truncado(api_local):
+    def respostas(pagina, tentativa):
+        if pagina == 1 and tentativa < 3:
+            return 503, b""
+        if pagina == 2 and tentativa == 1:
+            return 200, b'{"doses_aplicadas_pni": [{"codigo_'
+        return 200, registros(pagina) if pagina < 4 else []
+
+    url, tentativas = api_local(respostas)
+    paginas = coletar(url)
+    assert [pagina for pagina, _ in paginas] == [0, 1, 2, 3]
+    assert tentativas[1] == 3
+    assert tentativas[2] == 2
+
+
+def test_para_no_erro_4xx(api_local):
+    def respostas(pagina, tentativa):
+        return (404, b"") if pagina == 3 else (200, registros(pagina))
+
+    url, tentativas = api_local(respostas)
+    assert [pagina for pagina, _ in coletar(url)] == [0, 1, 2]
+    assert tentativas[3] == 1
+
+
+def test_para_na_pagina_vazia(api_local):
+    url, _ = api_local(lambda pagina, tentativa: (200, registros(pagina) if pagina < 2 else []))
+    assert [pagina for pagina, _ in coletar(url, workers=1)] == [0, 1]
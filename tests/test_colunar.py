@@ -0,0 +1,49 @@
+import sqlite3
+
+import pytest
+
+import tp2_extracao_carga as etl
+from colunar import CONSULTAS, SEM_REGISTRO, snapshot_atual
+from consultas import montar_consulta
+from dados import registro
+
+FILTROS = [{}, {"uf": "SP"}, {"municipio": "Município 2"}, {"vacina": "Vacina 1"},
+           {"data_inicio": "2025-03-02", "data_fim": "2025-03-04"}, {"data_fim": "2025-03-03"},
+           {"uf": "MG", "data_inicio": "2025-03-03"}, {"municipio": "Inexistente"}]
+
+
+def registros():
+    lote = []
+    for i in range(80):
+        item = registro(f"d{i}", paciente=f"p{i % 11}", idade=None if i % 11 == 3 else i * 7 % 90,
+                        estabelecimento=f"e{i % 6}", municipio=str(i % 6), uf="SP" if i % 6 < 2 else "MG",
+                        data=None if i % 9 == 0 else f"2025-03-0{1 + i % 6}", vacina=str(i % 3), local=str(i % 4))
+        if item["codigo_local_aplicacao"] == "0":
+            item["descricao_local_aplicacao"] = SEM_REGISTRO
+        lote.append(item)
+    return lote
+
+
+@pytest.fixture(scope="module")
+def bancos(tmp_path_factory):
+    pasta = tmp_path_factory.mktemp("colunar")
+    caminhos = {}
+    for compacto in (False, True):
+        caminhos[compacto] = str(pasta / f"compacto_{compacto}.db")
+        etl.criar_banco_e_popular(etl.tabela_enxuta(registros()), caminhos[compacto], compacto=compacto)
+    return caminhos
+
+
+@pytest.mark.parametrize("compacto", [False, True])
+@pytest.mark.parametrize("nome", CONSULTAS)
+@pytest.mark.parametrize("filtros", FILTROS)
+def test_snapshot_devolve_o_mesmo_resultado_que_o_sql(bancos, compacto, nome, filtros):
+    snapshot = snapshot_atual(bancos[compacto])
+    assert snapshot is not None
+    colunas, linhas = snapshot.consultar(nome, filtros)
+
+    with sqlite3.connect(bancos[compacto]) as conn:
+        cursor = conn.execute(*montar_consulta(nome, filtros, compacto))
+        esperado = cursor.fetchall()
+    assert colunas == [c[0] for c in cursor.description]
+    assert sorted(linhas, key=str) == sorted(esperado, key=str)
@@ -0,0 +1,66 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timedelta
+
+import consultas
+import metricas
+from cache_resultados import CacheResultados
+
+
+def em_outra_thread(funcao):
+    resultado = []
+    thread = threading.Thread(target=lambda: resultado.append(funcao()))
+    thread.start()
+    thread.join()
+    return resultado[0]
+
+
+def usar(caminho_db):
+    with consultas.conexao_leitura(caminho_db) as conn:
+        conn.execute("SELECT COUNT(*) FROM t").fetchone()
+        return conn
+
+
+def test_conexao_de_leitura_sobrevive_a_thread_que_a_usou(tmp_path):
+    caminho_db = str(tmp_path / "banco.db")
+    with sqlite3.connect(caminho_db) as conn:
+        conn.execute("CREATE TABLE t (x)")
+
+    # Cada execução do script no Streamlit roda em uma thread nova
+    primeira = em_outra_thread(lambda: usar(caminho_db))
+    assert em_outra_thread(lambda: usar(caminho_db)) is primeira
+
+    # Banco regravado: a conexão antiga é descartada
+    estado = os.stat(caminho_db)
+    os.utime(caminho_db, ns=(estado.st_atime_ns, estado.st_mtime_ns + 1_000_000))
+    assert em_outra_thread(lambda: usar(caminho_db)) is not primeira
+
+
+def test_cache_de_resultados_usa_uma_conexao_entre_threads(tmp_path):
+    cache = CacheResultados(str(tmp_path / "cache.db"))
+    em_outra_thread(lambda: cache.gravar("k", "v1", ["a"], [(1,)]))
+    assert em_outra_thread(lambda: cache.obter("k")) == (["a"], [(1,)])
+    assert em_outra_thread(cache.conexao) is cache.conexao()
+
+
+def test_metricas_antigas_sao_apagadas_quando_uma_execucao_abre_o_arquivo(tmp_path):
+    caminho = str(tmp_path / "metricas.db")
+    antiga = (datetime.now() - timedelta(days=metricas.DIAS_RETENCAO + 1)).isoformat(timespec="milliseconds")
+    recente = (datetime.now() - timedelta(days=1)).isoformat(timespec="milliseconds")
+    with sqlite3.connect(caminho) as conn:
+        conn.executescript(metricas.ESQUEMA)
+        for tabela in metricas.TABELAS_METRICAS:
+            coluna = {"MetricaEtapa": "etapa", "MetricaTabela": "tabela", "MetricaConsulta": "consulta"}.get(tabela)
+            for execucao, registrado_em in (("antiga", antiga), ("recente", recente)):
+                valores = {"execucao": execucao, "registrado_em": registrado_em, **({coluna: "x"} if coluna else {})}
+                conn.execute(f"INSERT INTO {tabela} ({', '.join(valores)}) VALUES ({', '.join('?' * len(valores))})",
+                             list(valores.values()))
+    conn.close()
+
+    metricas.configurar(caminho)
+    metricas.registrar_pagina(1, 0.1)
+    for tabela in metricas.TABELAS_METRICAS:
+        _, linhas = metricas.ler(f"SELECT DISTINCT execucao FROM {tabela} ORDER BY execucao")
+        assert "antiga" not in {execucao for execucao, in linhas}
+        assert ("recente",) in linhas
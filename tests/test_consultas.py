@@ -0,0 +1,42 @@
+import sqlite3
+
+import pytest
+
+import tp2_extracao_carga as etl
+from consultas import MODELOS, eh_banco_compacto, montar_consulta
+from dados import registro
+
+FILTROS = [{}, {"uf": "SP"}, {"municipio": "Município 2"}, {"data_inicio": "2025-03-02", "data_fim": "2025-03-04"}]
+
+
+@pytest.fixture(scope="module")
+def bancos(tmp_path_factory):
+    pasta = tmp_path_factory.mktemp("bancos")
+    registros = [
+        registro(f"d{i}", paciente=f"p{i % 7}", idade=i * 7 % 90, estabelecimento=f"e{i % 5}",
+                 municipio=str(i % 5), uf="SP" if i % 5 < 2 else "MG", data=f"2025-03-0{1 + i % 6}",
+                 local=str(i % 3))
+        for i in range(60)
+    ]
+    caminhos = {}
+    for compacto in (False, True):
+        caminhos[compacto] = str(pasta / f"compacto_{compacto}.db")
+        etl.criar_banco_e_popular(etl.tabela_enxuta(registros), caminhos[compacto], compacto=compacto)
+    return caminhos
+
+
+@pytest.mark.parametrize("nome", MODELOS)
+@pytest.mark.parametrize("filtros", FILTROS)
+def test_esquema_compacto_devolve_o_mesmo_resultado(bancos, nome, filtros):
+    resultados = []
+    for caminho in bancos.values():
+        with sqlite3.connect(caminho) as conn:
+            sql, parametros = montar_consulta(nome, filtros, eh_banco_compacto(conn))
+            resultados.append(sorted(conn.execute(sql, parametros).fetchall(), key=str))
+    assert resultados[0] == resultados[1]
+
+
+def test_esquema_compacto_nao_converte_datas(bancos):
+    with sqlite3.connect(bancos[True]) as conn:
+        sql, _ = montar_consulta("Consulta 2 — Vacinação por dia da semana", FILTROS[3], eh_banco_compacto(conn))
+    assert "data_aplicacao" not in sql
@@ -0,0 +1,23 @@
+from consultor_indices import motivo_rejeicao
+
+ANTES = {"C1": 0.010, "C2": 0.013, "C3": 0.020}
+
+
+def test_mantem_indice_que_acelera_as_consultas_que_o_usam():
+    medidas = {"C1": (0.004, {"idx_a"}), "C2": (0.013, set()), "C3": (0.021, set())}
+    assert motivo_rejeicao("idx_a", ANTES, medidas) is None
+
+
+def test_rejeita_indice_que_deixa_uma_consulta_mais_lenta():
+    medidas = {"C1": (0.0158, {"idx_a"}), "C2": (0.0217, {"idx_a"}), "C3": (0.005, {"idx_a"})}
+    assert motivo_rejeicao("idx_a", ANTES, medidas).startswith("piorou C1")
+
+
+def test_rejeita_indice_sem_ganho_alem_do_ruido():
+    medidas = {"C1": (0.0098, {"idx_a"}), "C2": (0.013, set()), "C3": (0.020, set())}
+    assert motivo_rejeicao("idx_a", ANTES, medidas).startswith("sem ganho")
+
+
+def test_rejeita_indice_nao_usado():
+    medidas = {nome: (latencia, set()) for nome, latencia in ANTES.items()}
+    assert motivo_rejeicao("idx_a", ANTES, medidas) == "não usado pelo planejador"
@@ -0,0 +1,76 @@
+import pytest
+
+import consultas
+import tp2_extracao_carga as etl
+from colunar import SEM_REGISTRO
+from dados import registro
+
+FILTROS = [{}, {"uf": "SP"}, {"uf": "MG"}, {"municipio": "Espalhado"}, {"municipio": "Sem UF"},
+           {"municipio": "Inexistente"}, {"vacina": "Vacina 1"}, {"data_inicio": "2025-03-02", "data_fim": "2025-03-04"},
+           {"uf": "SP", "data_fim": "2025-03-03"}]
+
+
+def registros():
+    # Por UF, dez municípios com totais distintos acima de 21; "Espalhado" tem 21 aplicações
+    # em SP e 21 em MG (códigos diferentes, mesmo nome): fica fora do top 10 de cada
+    # partição, mas é o 1º depois da soma, então o LIMIT só pode ser aplicado no final.
+    # Estabelecimentos sem UF vão para a partição SEM_UF.
+    municipios = [(f"SP{k}", f"São Paulo {k}", "SP", 22 + 2 * k) for k in range(10)]
+    municipios += [(f"MG{k}", f"Minas {k}", "MG", 23 + 2 * k) for k in range(10)]
+    municipios += [("ESP-SP", "Espalhado", "SP", 21), ("ESP-MG", "Espalhado", "MG", 21),
+                   ("ESP-X", "Espalhado", None, 3), ("SEM", "Sem UF", None, 5)]
+    lote = []
+    for codigo, nome, uf, quantidade in municipios:
+        for j in range(quantidade):
+            i = len(lote)
+            item = registro(f"d{i}", paciente=f"p{i % 37}", idade=None if i % 37 == 5 else i * 7 % 90,
+                            estabelecimento=f"e-{codigo}", municipio=codigo, uf=uf,
+                            data=None if i % 13 == 0 else f"2025-03-0{1 + i % 6}", vacina=str(i % 3), local=str(i % 4))
+            item["nome_municipio_estabelecimento"] = nome
+            if item["codigo_local_aplicacao"] == "0":
+                item["descricao_local_aplicacao"] = SEM_REGISTRO
+            lote.append(item)
+    return lote
+
+
+@pytest.fixture(scope="module")
+def bancos(tmp_path_factory):
+    pasta = tmp_path_factory.mktemp("particoes")
+    unico, particionado = str(pasta / "unico.db"), str(pasta / "particionado.db")
+    etl.criar_banco_e_popular(etl.tabela_enxuta(registros()), unico)
+    etl.criar_banco_e_popular(etl.tabela_enxuta(registros()), particionado, particionar=True, processos=2)
+    return unico, str(consultas.pasta_particoes_padrao(particionado))
+
+
+def comparavel(linhas):
+    # Empates no último total podem ser cortados pelo LIMIT em qualquer ordem
+    totais = sorted((total for _, total in linhas), reverse=True)
+    return totais, sorted((linha for linha in linhas if linha[1] != totais[-1]), key=str)
+
+
+def test_manifesto_lista_as_particoes_de_cada_uf_e_municipio(bancos):
+    _, pasta = bancos
+    manifesto = consultas.ler_manifesto(pasta)
+    assert set(manifesto["shards"]) == {"SP", "MG", etl.SEM_UF}
+    assert sorted(manifesto["municipios"]["Espalhado"]) == sorted(["SP", "MG", etl.SEM_UF])
+    assert consultas.particoes_dos_filtros(manifesto, {"uf": "SP"}) == ["SP"]
+    assert consultas.particoes_dos_filtros(manifesto, {"municipio": "Sem UF"}) == [etl.SEM_UF]
+    assert sorted(consultas.particoes_dos_filtros(manifesto, {"municipio": "Espalhado"})) == sorted(["SP", "MG", etl.SEM_UF])
+    assert len(consultas.particoes_dos_filtros(manifesto, {"municipio": "Inexistente"})) == 1
+
+
+@pytest.mark.parametrize("nome", consultas.MODELOS)
+@pytest.mark.parametrize("filtros", FILTROS)
+def test_particoes_devolvem_o_mesmo_resultado_que_o_banco_unico(bancos, nome, filtros):
+    unico, pasta = bancos
+    colunas, linhas = consultas.executar_consulta(unico, nome, filtros)
+    colunas_particoes, linhas_particoes = consultas.executar_consulta_particionada(pasta, nome, filtros)
+    assert colunas_particoes == colunas
+    assert comparavel(linhas_particoes) == comparavel(linhas)
+
+
+def test_limit_depois_da_soma_das_particoes(bancos):
+    _, pasta = bancos
+    _, linhas = consultas.executar_consulta_particionada(pasta, "Consulta 3 — Top Municípios com Maior Número de Doses Aplicadas")
+    assert len(linhas) == 10
+    assert linhas[0] == ("Espalhado", 45)
@@ -0,0 +1,75 @@
+import random
+import sqlite3
+
+import pytest
+
+import tp2_extracao_carga as etl
+from consultas import MODELOS, eh_banco_compacto, montar_consulta, montar_consulta_resumo
+from dados import registro
+
+FILTROS = [{}, {"uf": "SP"}, {"municipio": "Município 3"}, {"data_inicio": "2025-03-03"}, {"data_fim": "2025-03-04"}]
+
+
+def registros(inicio, quantidade, semente, municipio_do_estabelecimento, nome_municipio=None):
+    sorteio = random.Random(semente)
+    lote = []
+    for i in range(inicio, inicio + quantidade):
+        estabelecimento = sorteio.randrange(20)
+        municipio = municipio_do_estabelecimento(estabelecimento)
+        item = registro(f"d{i}", paciente=f"p{sorteio.randrange(900)}", idade=sorteio.randrange(90),
+                        estabelecimento=f"e{estabelecimento}", municipio=str(municipio),
+                        uf="SP" if municipio % 2 else "MG", data=f"2025-03-0{1 + sorteio.randrange(7)}",
+                        local=str(sorteio.randrange(3)))
+        if nome_municipio:
+            item["nome_municipio_estabelecimento"] = nome_municipio(municipio)
+        if i % 10 == 0:
+            item["data_vacina"] = None
+        lote.append(item)
+    return lote
+
+
+def conferir_resumos(caminho_db, compacto):
+    with sqlite3.connect(caminho_db) as conn:
+        assert eh_banco_compacto(conn) == compacto
+        for nome in MODELOS:
+            for filtros in FILTROS:
+                resumo = montar_consulta_resumo(nome, filtros)
+                if resumo is None:
+                    continue
+                base = montar_consulta(nome, filtros, compacto)
+                assert sorted(conn.execute(*resumo).fetchall(), key=str) == \
+                    sorted(conn.execute(*base).fetchall(), key=str), (nome, filtros)
+
+
+@pytest.mark.parametrize("compacto", [False, True])
+def test_resumos_seguem_a_consulta_base_apos_carga_incremental(tmp_path, compacto):
+    caminho_db = str(tmp_path / "vacinacao.db")
+    etl.criar_banco_e_popular(etl.tabela_enxuta(registros(0, 1500, 1, lambda e: e % 8)), caminho_db, compacto=compacto)
+
+    # Pacientes que voltam com outra idade, estabelecimentos que mudam de município,
+    # um município renomeado e aplicações reenviadas
+    novos = registros(1000, 1500, 2, lambda e: (e + 1) % 8,
+                      lambda m: "Município 3" if m == 5 else f"Município {m}")
+    etl.criar_banco_e_popular(etl.tabela_enxuta(novos), caminho_db, incremental=True)
+    conferir_resumos(caminho_db, compacto)
+
+
+@pytest.mark.parametrize("compacto", [False, True])
+def test_resumos_reagregam_so_as_aplicacoes_alteradas(tmp_path, compacto):
+    caminho_db = str(tmp_path / "vacinacao.db")
+    etl.criar_banco_e_popular(etl.tabela_enxuta(registros(0, 1500, 1, lambda e: e % 8)), caminho_db, compacto=compacto)
+
+    # Aplicações novas dos mesmos pacientes e estabelecimentos, sem mudar idade nem
+    # município, e um município só renomeado: as aplicações gravadas não são reagregadas
+    novos = registros(1500, 50, 1, lambda e: e % 8, lambda m: "Município 3" if m == 5 else f"Município {m}")
+    with sqlite3.connect(caminho_db) as conn:
+        idades = dict(conn.execute("SELECT id, idade FROM Paciente" if not compacto else "SELECT codigo, idade FROM PacienteDim"))
+    for item in novos:
+        item["numero_idade_paciente"] = idades.get(item["codigo_paciente"], item["numero_idade_paciente"])
+    lote = etl.tabela_enxuta(novos)
+    with sqlite3.connect(caminho_db) as conn:
+        etl.registrar_lote_aplicacao(conn, lote, compacto)
+        assert conn.execute("SELECT COUNT(*) FROM temp.lote_aplicacao").fetchone()[0] == len(novos)
+
+    etl.criar_banco_e_popular(lote, caminho_db, incremental=True)
+    conferir_resumos(caminho_db, compacto)
@@ -1,128 +1,991 @@
 # tp2_extracao_carga.py
 
 import requests
+import gzip
 import json
+import multiprocessing
+import shutil
+import sys
 import time
+import threading
+import uuid
+import numpy as np
 import pandas as pd
+from pandas.api.types import union_categoricals
 import sqlite3
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from pathlib import Path
+from requests.adapters import HTTPAdapter
+
+import metricas
+from colunar import exportar_snapshot
+from consultas import ARQUIVO_MANIFESTO, aquecer_cache, aquecer_cache_particoes, eh_banco_compacto, pasta_particoes_padrao
+
+API_URL = "https://apidadosabertos.saude.gov.br/vacinacao/doses-aplicadas-pni-2025"
+LIMITE_POR_PAGINA = 1000
 
 # ---------- ETAPA 1: Coleta de dados ----------
-def coletar_dados_vacinacao(max_paginas=10, delay=1, salvar_arquivo=True):
-    base_url = "https://apidadosabertos.saude.gov.br/vacinacao/doses-aplicadas-pni-2025"
-    limit = 1000
-    offset = 0
-    all_data = []
+class BaldeDeTokens:
+    # Token bucket compartilhado entre as threads: libera até `taxa_por_segundo`
+    # requisições por segundo, com rajadas de no máximo `capacidade`.
+    def __init__(self, taxa_por_segundo, capacidade=None):
+        self.taxa = taxa_por_segundo
+        self.capacidade = capacidade or max(1.0, taxa_por_segundo)
+        self.tokens = self.capacidade
+        self.ultimo = time.monotonic()
+        self.lock = threading.Lock()
+
+    def adquirir(self):
+        while True:
+            with self.lock:
+                agora = time.monotonic()
+                self.tokens = min(self.capacidade, self.tokens + (agora - self.ultimo) * self.taxa)
+                self.ultimo = agora
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                espera = (1 - self.tokens) / self.taxa
+            time.sleep(espera)
+
+
+def criar_sessao(workers=1):
+    # Sessão keep-alive com um pool de conexões do tamanho do número de workers
+    sessao = requests.Session()
+    adaptador = HTTPAdapter(pool_connections=1, pool_maxsize=max(1, workers))
+    sessao.mount("http://", adaptador)
+    sessao.mount("https://", adaptador)
+    sessao.headers.update({"accept": "application/json"})
+    return sessao
+
+
+def buscar_pagina(sessao, pagina, base_url=API_URL, balde=None, tentativas=5, backoff=0.5, timeout=30):
+    # Retorna a lista de registros da página, ou None se a página não pôde ser obtida.
+    # Erros 5xx, timeouts, falhas de conexão (inclusive no meio do corpo, como
+    # ChunkedEncodingError) e respostas 200 com JSON truncado ou inválido são repetidos
+    # com backoff exponencial.
+    url = f"{base_url}?limit={LIMITE_POR_PAGINA}&offset={pagina}"
+    for tentativa in range(tentativas):
+        if balde is not None:
+            balde.adquirir()
+        inicio = time.perf_counter()
+        try:
+            response = sessao.get(url, timeout=timeout)
+            dados = response.json().get("doses_aplicadas_pni", []) if response.status_code == 200 else None
+        except (requests.RequestException, ValueError) as e:
+            motivo = type(e).__name__
+            metricas.registrar_pagina(pagina, time.perf_counter() - inicio, status=motivo, tentativa=tentativa + 1)
+        else:
+            if dados is not None:
+                metricas.registrar_pagina(pagina, time.perf_counter() - inicio, len(response.content), 200,
+                                          tentativa + 1, len(dados))
+                return dados
+            metricas.registrar_pagina(pagina, time.perf_counter() - inicio, len(response.content),
+                                      response.status_code, tentativa + 1)
+            if response.status_code < 500:
+                print(f"Erro na página {pagina}: Status {response.status_code}")
+                return None
+            motivo = f"Status {response.status_code}"
+        if tentativa < tentativas - 1:
+            time.sleep(backoff * 2 ** tentativa)
+    print(f"Erro na página {pagina}: {motivo} após {tentativas} tentativas")
+    return None
 
-    for pagina in range(max_paginas):
-        url = f"{base_url}?limit={limit}&offset={offset}"
+
+def iterar_paginas(max_paginas, workers=8, taxa_por_segundo=10, base_url=API_URL, pagina_inicial=0):
+    # Busca as páginas em paralelo, mas as entrega sempre na ordem em que aparecem na API.
+    # Mantém no máximo 2 * workers requisições em andamento e para na primeira página
+    # vazia ou com erro, descartando as páginas seguintes.
+    balde = BaldeDeTokens(taxa_por_segundo) if taxa_por_segundo else None
+    paginas = iter(range(pagina_inicial, pagina_inicial + max_paginas))
+    pendentes = deque()
+
+    with criar_sessao(workers) as sessao, ThreadPoolExecutor(max_workers=workers) as executor:
+        def submeter():
+            pagina = next(paginas, None)
+            if pagina is not None:
+                pendentes.append((pagina, executor.submit(buscar_pagina, sessao, pagina, base_url, balde)))
+
+        for _ in range(2 * workers):
+            submeter()
+        try:
+            while pendentes:
+                pagina, futuro = pendentes.popleft()
+                dados = futuro.result()
+                if dados is None:
+                    return
+                if not dados:
+                    print(f"Sem dados na página {pagina}, encerrando.")
+                    return
+                submeter()
+                yield pagina, dados
+        finally:
+            for _, futuro in pendentes:
+                futuro.cancel()
+
+
+def iterar_paginas_sequencial(max_paginas, delay=1, base_url=API_URL, pagina_inicial=0):
+    offset = pagina_inicial
+    for pagina in range(pagina_inicial, pagina_inicial + max_paginas):
+        url = f"{base_url}?limit={LIMITE_POR_PAGINA}&offset={offset}"
+        inicio = time.perf_counter()
         response = requests.get(url, headers={"accept": "application/json"})
 
         if response.status_code != 200:
+            metricas.registrar_pagina(pagina, time.perf_counter() - inicio, len(response.content), response.status_code)
             print(f"Erro na página {pagina}: Status {response.status_code}")
             break
 
         dados = response.json().get("doses_aplicadas_pni", [])
+        metricas.registrar_pagina(pagina, time.perf_counter() - inicio, len(response.content), 200, registros=len(dados))
         if not dados:
             print(f"Sem dados na página {pagina}, encerrando.")
             break
 
-        all_data.extend(dados)
-        print(f"Página {pagina} coletada com {len(dados)} registros.")
+        yield pagina, dados
         offset += 1
         time.sleep(delay)
 
+
+def paginas_da_api(max_paginas, delay=1, workers=None, taxa_por_segundo=10, base_url=API_URL, pagina_inicial=0):
+    # Com `workers`, as páginas são buscadas em paralelo (ver iterar_paginas);
+    # sem, mantém a coleta sequencial original com `delay` entre as páginas.
+    if workers:
+        return iterar_paginas(max_paginas, workers, taxa_por_segundo, base_url, pagina_inicial)
+    return iterar_paginas_sequencial(max_paginas, delay, base_url, pagina_inicial)
+
+
+def coletar_dados_vacinacao(max_paginas=10, delay=1, salvar_arquivo=True, workers=None, taxa_por_segundo=10, base_url=API_URL):
+    paginas = paginas_da_api(max_paginas, delay, workers, taxa_por_segundo, base_url)
+
+    all_data = []
+    with metricas.etapa("coleta"):
+        for pagina, dados in paginas:
+            all_data.extend(dados)
+            print(f"Página {pagina} coletada com {len(dados)} registros.")
+
     if salvar_arquivo:
-        with open("dados_vacinacao_2025.json", "w", encoding="utf-8") as f:
+        with metricas.etapa("salvar_json"), open("dados_vacinacao_2025.json", "w", encoding="utf-8") as f:
             json.dump(all_data, f, ensure_ascii=False, indent=2)
         print(f"Arquivo 'dados_vacinacao_2025.json' salvo com {len(all_data)} registros.")
 
     return all_data
 
+
+def abrir_spool(caminho_spool, modo="r"):
+    # Spool NDJSON: um registro por linha, comprimido com gzip se terminar em .gz
+    if str(caminho_spool).endswith(".gz"):
+        return gzip.open(caminho_spool, modo + "t", encoding="utf-8")
+    return open(caminho_spool, modo, encoding="utf-8")
+
+
+def coletar_para_spool(caminho_spool="dados_vacinacao_2025.ndjson.gz", max_paginas=10, delay=1, workers=None,
+                       taxa_por_segundo=10, base_url=API_URL, pagina_inicial=0, anexar=False):
+    # Versão em fluxo da coleta: cada página é gravada no spool assim que chega,
+    # sem acumular os registros em memória. Devolve o total de registros e a próxima
+    # página a buscar, para criar_banco_e_popular gravar o checkpoint (ver ETAPA 4).
+    total = 0
+    proxima_pagina = pagina_inicial
+    with metricas.etapa("coleta"), abrir_spool(caminho_spool, "a" if anexar else "w") as f:
+        for pagina, dados in paginas_da_api(max_paginas, delay, workers, taxa_por_segundo, base_url, pagina_inicial):
+            for registro in dados:
+                f.write(json.dumps(registro, ensure_ascii=False))
+                f.write("\n")
+            total += len(dados)
+            # Mesma regra da carga incremental: página incompleta é buscada de novo
+            proxima_pagina = pagina + 1 if len(dados) >= LIMITE_POR_PAGINA else pagina
+            print(f"Página {pagina} coletada com {len(dados)} registros.")
+    print(f"Spool '{caminho_spool}' gravado com {total} registros.")
+    return total, proxima_pagina
+
 # ---------- ETAPA 2: Unificação dos JSONs ----------
-def unificar_jsons_em_tabela(caminho_json: str) -> pd.DataFrame:
+# Modo enxuto (enxuto=True): lê só os campos usados pelo esquema (COLUNAS_USADAS, definida
+# junto com CARGA_TABELAS) já com tipos compactos, em vez de strings Python em todas as
+# colunas da API. Códigos e descrições viram categorias (um inteiro por linha + a lista de
+# valores distintos), a idade vira inteiro anulável e a data é convertida para datetime.
+COLUNAS_ALTA_CARDINALIDADE = {'codigo_documento', 'codigo_paciente', 'numero_cep_paciente'}
+
+
+def tipar_colunas(valores_por_coluna) -> pd.DataFrame:
+    # {campo: lista de valores} -> DataFrame com os tipos do modo enxuto
+    colunas = {}
+    for campo in list(valores_por_coluna):
+        valores = valores_por_coluna.pop(campo)
+        if campo == 'numero_idade_paciente':
+            colunas[campo] = pd.to_numeric(pd.Series(valores, dtype=object), errors='coerce').astype('Int16')
+        elif campo == 'data_vacina':
+            colunas[campo] = pd.to_datetime(pd.Series(valores, dtype=object), errors='coerce', format='ISO8601')
+        elif campo in COLUNAS_ALTA_CARDINALIDADE:
+            colunas[campo] = pd.Series(valores, dtype=object)
+        else:
+            colunas[campo] = pd.Series(pd.Categorical(valores))
+    return pd.DataFrame(colunas)
+
+
+def tabela_enxuta(registros) -> pd.DataFrame:
+    return tipar_colunas({campo: [registro.get(campo) for registro in registros] for campo in COLUNAS_USADAS})
+
+
+def iterar_registros_json(caminho_json, tamanho_leitura=1 << 20):
+    # Lê um arquivo com uma lista JSON de objetos registro a registro: o arquivo é lido em
+    # pedaços e cada objeto é decodificado assim que chega inteiro ao buffer, sem montar
+    # a lista completa na memória como json.load
+    decodificador = json.JSONDecoder()
     with open(caminho_json, "r", encoding="utf-8") as f:
-        dados = json.load(f)
-    return pd.DataFrame(dados)
+        buffer = f.read(tamanho_leitura).lstrip()
+        if not buffer.startswith("["):
+            raise ValueError(f"'{caminho_json}' não contém uma lista JSON")
+        posicao, fim_do_arquivo = 1, False
+        while True:
+            while posicao < len(buffer) and buffer[posicao] in " \t\r\n,":
+                posicao += 1
+            if buffer.startswith("]", posicao):
+                return
+            try:
+                registro, posicao = decodificador.raw_decode(buffer, posicao)
+            except json.JSONDecodeError:
+                # Objeto incompleto: traz o próximo pedaço do arquivo
+                if fim_do_arquivo:
+                    raise
+                pedaco = f.read(tamanho_leitura)
+                fim_do_arquivo = not pedaco
+                buffer, posicao = buffer[posicao:] + pedaco, 0
+                continue
+            yield registro
+
+
+def blocos_de_registros(registros, tamanho_bloco=50_000, enxuto=False):
+    # Agrupa um iterável de registros em DataFrames de no máximo `tamanho_bloco` linhas;
+    # no modo enxuto só os campos usados de cada registro ficam no bloco
+    def novo_bloco():
+        return {campo: [] for campo in COLUNAS_USADAS} if enxuto else []
+
+    def montar(bloco):
+        return tipar_colunas(bloco) if enxuto else pd.DataFrame(bloco)
+
+    bloco, linhas = novo_bloco(), 0
+    for registro in registros:
+        if enxuto:
+            for campo, valores in bloco.items():
+                valores.append(registro.get(campo))
+        else:
+            bloco.append(registro)
+        linhas += 1
+        if linhas >= tamanho_bloco:
+            yield montar(bloco)
+            bloco, linhas = novo_bloco(), 0
+    if linhas:
+        yield montar(bloco)
+
+
+def concatenar_blocos(blocos) -> pd.DataFrame:
+    # pd.concat converteria para object as colunas categóricas com categorias diferentes
+    # entre os blocos; union_categoricals junta as categorias e mantém os códigos inteiros
+    blocos = list(blocos)
+    if not blocos:
+        return tipar_colunas({campo: [] for campo in COLUNAS_USADAS})
+    if len(blocos) == 1:
+        return blocos[0]
+    colunas = {}
+    for coluna in blocos[0].columns:
+        partes = [bloco.pop(coluna) for bloco in blocos]
+        if isinstance(partes[0].dtype, pd.CategoricalDtype):
+            partes = [parte.cat.set_categories(parte.cat.categories.astype(object)) for parte in partes]
+            colunas[coluna] = pd.Series(union_categoricals(partes))
+        else:
+            colunas[coluna] = pd.concat(partes, ignore_index=True)
+    return pd.DataFrame(colunas)
+
+
+def unificar_jsons_em_tabela(caminho_json: str, enxuto=False, tamanho_bloco=10_000) -> pd.DataFrame:
+    # Aceita o JSON da coleta (lista de registros) ou um spool NDJSON (.ndjson/.ndjson.gz).
+    # No modo enxuto os registros são lidos um a um e tipados em blocos, então o pico de
+    # memória é o do DataFrame compacto mais um bloco, e não o da lista JSON inteira.
+    with metricas.etapa("unificar"):
+        if ".ndjson" in str(caminho_json):
+            return concatenar_blocos(ler_spool_em_blocos(caminho_json, tamanho_bloco, enxuto))
+        if enxuto:
+            return concatenar_blocos(blocos_de_registros(iterar_registros_json(caminho_json), tamanho_bloco, enxuto=True))
+        with open(caminho_json, "r", encoding="utf-8") as f:
+            return pd.DataFrame(json.load(f))
+
+
+def ler_spool_em_blocos(caminho_spool, tamanho_bloco=50_000, enxuto=False):
+    # Lê o spool NDJSON devolvendo DataFrames de no máximo `tamanho_bloco` linhas
+    with abrir_spool(caminho_spool) as f:
+        yield from blocos_de_registros((json.loads(linha) for linha in f if linha.strip()), tamanho_bloco, enxuto)
 
 # ---------- ETAPA 3: Criação e carga do banco ----------
-def criar_banco_e_popular(df_unificado: pd.DataFrame, caminho_db="vacinacao.db"):
-    conn = sqlite3.connect(caminho_db)
+TABELAS = [
+    'Aplicacao', 'Paciente', 'Estabelecimento', 'Vacina', 'RacaCor', 'EtniaIndigena',
+    'Municipio', 'UF', 'Fabricante', 'DoseVacina', 'GrupoAtendimento', 'CategoriaAtendimento',
+    'TipoEstabelecimento', 'NaturezaEstabelecimento', 'LocalAplicacao', 'ViaAdministracao',
+    'EstrategiaVacinacao', 'CondicaoMaternal', 'OrigemRegistro', 'SistemaOrigem', 'CargaCheckpoint'
+]
+
+# Tabela -> lista de mapeamentos {campo da API: coluna da tabela}, na ordem de carga
+# (dimensões antes das tabelas que as referenciam). A primeira coluna é sempre a chave
+# primária; tabelas com mais de um mapeamento juntam as origens antes de deduplicar.
+CARGA_TABELAS = {
+    'RacaCor': [{'codigo_raca_cor_paciente': 'codigo', 'nome_raca_cor_paciente': 'descricao'}],
+    'EtniaIndigena': [{'codigo_etnia_indigena_paciente': 'codigo', 'nome_etnia_indigena_paciente': 'descricao'}],
+    'UF': [
+        {'sigla_uf_paciente': 'sigla', 'nome_uf_paciente': 'nome'},
+        {'sigla_uf_estabelecimento': 'sigla', 'nome_uf_estabelecimento': 'nome'},
+    ],
+    'Municipio': [
+        {'codigo_municipio_paciente': 'codigo', 'nome_municipio_paciente': 'nome', 'sigla_uf_paciente': 'uf_sigla'},
+        {'codigo_municipio_estabelecimento': 'codigo', 'nome_municipio_estabelecimento': 'nome', 'sigla_uf_estabelecimento': 'uf_sigla'},
+    ],
+    'Fabricante': [{'codigo_vacina_fabricante': 'codigo', 'descricao_vacina_fabricante': 'descricao'}],
+    'DoseVacina': [{'codigo_dose_vacina': 'codigo', 'descricao_dose_vacina': 'descricao'}],
+    'GrupoAtendimento': [{'codigo_vacina_grupo_atendimento': 'codigo', 'descricao_vacina_grupo_atendimento': 'descricao'}],
+    'CategoriaAtendimento': [{'codigo_vacina_categoria_atendimento': 'codigo', 'descricao_vacina_categoria_atendimento': 'descricao'}],
+    'TipoEstabelecimento': [{'codigo_tipo_estabelecimento': 'codigo', 'descricao_tipo_estabelecimento': 'descricao'}],
+    'NaturezaEstabelecimento': [{'codigo_natureza_estabelecimento': 'codigo', 'descricao_natureza_estabelecimento': 'descricao'}],
+    'LocalAplicacao': [{'codigo_local_aplicacao': 'codigo', 'descricao_local_aplicacao': 'descricao'}],
+    'ViaAdministracao': [{'codigo_via_administracao': 'codigo', 'descricao_via_administracao': 'descricao'}],
+    'EstrategiaVacinacao': [{'codigo_estrategia_vacinacao': 'codigo', 'descricao_estrategia_vacinacao': 'descricao'}],
+    'CondicaoMaternal': [{'codigo_condicao_maternal': 'codigo', 'descricao_condicao_maternal': 'descricao'}],
+    'OrigemRegistro': [{'codigo_origem_registro': 'codigo', 'descricao_origem_registro': 'descricao'}],
+    'SistemaOrigem': [{'codigo_sistema_origem': 'codigo', 'descricao_sistema_origem': 'descricao'}],
+    'Paciente': [{
+        'codigo_paciente': 'id', 'tipo_sexo_paciente': 'sexo', 'numero_idade_paciente': 'idade', 'numero_cep_paciente': 'cep', 'descricao_nacionalidade_paciente': 'nacionalidade', 'codigo_raca_cor_paciente': 'raca_cor_fk', 'codigo_municipio_paciente': 'municipio_fk', 'codigo_etnia_indigena_paciente': 'etnia_indigena_fk'
+    }],
+    'Estabelecimento': [{
+        'codigo_cnes_estabelecimento': 'id', 'nome_razao_social_estabelecimento': 'razao_social', 'nome_fantasia_estalecimento': 'nome_fantasia', 'codigo_municipio_estabelecimento': 'municipio_fk', 'codigo_tipo_estabelecimento': 'tipo_fk', 'codigo_natureza_estabelecimento': 'natureza_fk'
+    }],
+    'Vacina': [{
+        'codigo_vacina': 'id', 'descricao_vacina': 'descricao', 'sigla_vacina': 'sigla', 'codigo_vacina_fabricante': 'fabricante_fk', 'codigo_vacina_grupo_atendimento': 'grupo_atendimento_fk', 'codigo_vacina_categoria_atendimento': 'categoria_atendimento_fk'
+    }],
+    'Aplicacao': [{
+        'codigo_documento': 'id', 'data_vacina': 'data_aplicacao', 'codigo_lote_vacina': 'lote', 'status_documento': 'status_documento', 'codigo_paciente': 'paciente_fk', 'codigo_vacina': 'vacina_fk', 'codigo_cnes_estabelecimento': 'estabelecimento_fk', 'codigo_dose_vacina': 'dose_fk', 'codigo_local_aplicacao': 'local_aplicacao_fk', 'codigo_via_administracao': 'via_administracao_fk', 'codigo_estrategia_vacinacao': 'estrategia_fk', 'codigo_condicao_maternal': 'condicao_maternal_fk', 'codigo_origem_registro': 'origem_registro_fk', 'codigo_sistema_origem': 'sistema_origem_fk'
+    }],
+}
+
+# Campos da API lidos no modo enxuto (ver ETAPA 2)
+COLUNAS_USADAS = list(dict.fromkeys(campo for mapeamentos in CARGA_TABELAS.values() for m in mapeamentos for campo in m))
+
+
+# Esquema compacto (schema_compacto.sql): coluna de chave estrangeira do schema.sql ->
+# (tabela referenciada, coluna com o id inteiro na tabela compacta)
+REFERENCIAS_COMPACTAS = {
+    'uf_sigla': ('UF', 'uf_id'),
+    'raca_cor_fk': ('RacaCor', 'raca_cor_id'),
+    'municipio_fk': ('Municipio', 'municipio_id'),
+    'etnia_indigena_fk': ('EtniaIndigena', 'etnia_indigena_id'),
+    'tipo_fk': ('TipoEstabelecimento', 'tipo_id'),
+    'natureza_fk': ('NaturezaEstabelecimento', 'natureza_id'),
+    'fabricante_fk': ('Fabricante', 'fabricante_id'),
+    'grupo_atendimento_fk': ('GrupoAtendimento', 'grupo_atendimento_id'),
+    'categoria_atendimento_fk': ('CategoriaAtendimento', 'categoria_atendimento_id'),
+    'paciente_fk': ('Paciente', 'paciente_id'),
+    'vacina_fk': ('Vacina', 'vacina_id'),
+    'estabelecimento_fk': ('Estabelecimento', 'estabelecimento_id'),
+    'dose_fk': ('DoseVacina', 'dose_id'),
+    'local_aplicacao_fk': ('LocalAplicacao', 'local_aplicacao_id'),
+    'via_administracao_fk': ('ViaAdministracao', 'via_administracao_id'),
+    'estrategia_fk': ('EstrategiaVacinacao', 'estrategia_id'),
+    'condicao_maternal_fk': ('CondicaoMaternal', 'condicao_maternal_id'),
+    'origem_registro_fk': ('OrigemRegistro', 'origem_registro_id'),
+    'sistema_origem_fk': ('SistemaOrigem', 'sistema_origem_id'),
+}
+
+
+def tabela_compacta(tabela):
+    return 'AplicacaoFato' if tabela == 'Aplicacao' else f'{tabela}Dim'
+
+
+# Tabelas de resumo (resumos.sql) -> (colunas da chave UNIQUE, SELECT que gera a chave,
+# as demais colunas e a contagem). As consultas usam os nomes do schema.sql, então
+# funcionam também sobre as views do esquema compacto.
+RESUMOS = {
+    'ResumoFaixaEtaria': (['faixa_etaria', 'municipio_codigo', 'municipio_nome', 'uf_sigla', 'data_aplicacao'], """
+        SELECT
+            CASE
+                WHEN p.idade < 12 THEN 'Crianças (0-11)'
+                WHEN p.idade BETWEEN 12 AND 17 THEN 'Adolescentes (12-17)'
+                WHEN p.idade BETWEEN 18 AND 59 THEN 'Adultos (18-59)'
+                WHEN p.idade >= 60 THEN 'Idosos (60+)'
+                ELSE 'Não Informado'
+            END,
+            COALESCE(m.codigo, ''), m.nome, m.uf_sigla, COALESCE(a.data_aplicacao, ''), COUNT(*) * {sinal}
+        FROM Paciente AS p
+        JOIN Aplicacao AS a ON p.id = a.paciente_fk
+        LEFT JOIN Estabelecimento AS e ON a.estabelecimento_fk = e.id
+        LEFT JOIN Municipio AS m ON e.municipio_fk = m.codigo
+        WHERE {filtro}
+        GROUP BY 1, 2, 3, 4, 5
+    """, ['faixa_etaria', 'municipio_codigo', 'data_aplicacao']),
+    'ResumoDiaSemana': (['dia_semana', 'municipio_codigo', 'municipio_nome', 'uf_sigla'], """
+        SELECT COALESCE(strftime('%w', a.data_aplicacao), ''), m.codigo, m.nome, m.uf_sigla, COUNT(*) * {sinal}
+        FROM Aplicacao AS a
+        JOIN Estabelecimento AS e ON a.estabelecimento_fk = e.id
+        JOIN Municipio AS m ON e.municipio_fk = m.codigo
+        WHERE {filtro}
+        GROUP BY 1, 2, 3, 4
+    """, ['dia_semana', 'municipio_codigo']),
+    'ResumoLocalAplicacao': (['local_codigo', 'descricao'], """
+        SELECT l.codigo, l.descricao, COUNT(*) * {sinal}
+        FROM Aplicacao AS a
+        JOIN LocalAplicacao AS l ON a.local_aplicacao_fk = l.codigo
+        WHERE {filtro}
+        GROUP BY 1, 2
+    """, ['local_codigo']),
+}
+
+
+# Rótulos copiados das dimensões para os resumos: tabela -> (dimensão, junção, colunas);
+# o upsert pode renomear um município ou local sem mudar a chave do resumo. Só as linhas
+# dos códigos listados por registrar_lote_rotulos são reescritas.
+ROTULOS_RESUMOS = {
+    'ResumoFaixaEtaria': ('Municipio', 'd.codigo = r.municipio_codigo', {'municipio_nome': 'nome', 'uf_sigla': 'uf_sigla'}),
+    'ResumoDiaSemana': ('Municipio', 'd.codigo = r.municipio_codigo', {'municipio_nome': 'nome', 'uf_sigla': 'uf_sigla'}),
+    'ResumoLocalAplicacao': ('LocalAplicacao', 'd.codigo = r.local_codigo', {'descricao': 'descricao'}),
+}
+
+
+def atualizar_resumos(conn, sinal=1, somente_lote=False):
+    # Sem somente_lote, recalcula os resumos do zero. Com somente_lote, soma (sinal=1) ou
+    # subtrai (sinal=-1) a contribuição das aplicações listadas em temp.lote_aplicacao:
+    # a carga subtrai antes de gravar o bloco e soma depois, então uma aplicação
+    # reenviada pela API não é contada duas vezes.
+    filtro = "a.id IN (SELECT id FROM temp.lote_aplicacao)" if somente_lote else "true"
+    for tabela, (colunas, consulta, chave) in RESUMOS.items():
+        if not somente_lote:
+            conn.execute(f"DELETE FROM {tabela}")
+        conn.execute(
+            f"INSERT INTO {tabela} ({', '.join(colunas)}, total) {consulta.format(filtro=filtro, sinal=int(sinal))} "
+            f"ON CONFLICT({', '.join(chave)}) DO UPDATE SET total = total + excluded.total"
+        )
+        if somente_lote:
+            conn.execute(f"DELETE FROM {tabela} WHERE total = 0")
+    if somente_lote and sinal > 0:
+        for tabela, (dimensao, juncao, colunas) in ROTULOS_RESUMOS.items():
+            # Sem rótulo alterado no bloco não há o que reescrever (e o UPDATE varreria o resumo)
+            if conn.execute("SELECT 1 FROM temp.lote_rotulos WHERE dimensao = ?", (dimensao,)).fetchone() is None:
+                continue
+            conn.execute(
+                f"UPDATE {tabela} AS r SET {', '.join(f'{c} = d.{v}' for c, v in colunas.items())} "
+                f"FROM {dimensao} AS d WHERE {juncao} "
+                f"AND d.codigo IN (SELECT codigo FROM temp.lote_rotulos WHERE dimensao = ?)",
+                (dimensao,)
+            )
+
+
+def registrar_lote_aplicacao(conn, df_unificado: pd.DataFrame, compacto=False):
+    # Além das aplicações do bloco, entram as já gravadas dos pacientes cuja idade o upsert
+    # vai mudar e dos estabelecimentos que vão mudar de município: elas precisam sair da
+    # faixa/município antigo e entrar no novo. Chamada antes do upsert, para comparar os
+    # valores do bloco com os gravados (nulos não sobrescrevem, ver inserir_em_massa).
+    # CROSS JOIN fixa a ordem: o planejador não tem estatísticas das tabelas temporárias e
+    # escolhia percorrer a tabela de aplicações inteira.
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS lote_aplicacao (id TEXT PRIMARY KEY)")
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS lote_paciente (id TEXT PRIMARY KEY, idade INTEGER)")
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS lote_estabelecimento (id TEXT PRIMARY KEY, municipio TEXT)")
+    for tabela, mapeamento in (
+        ('lote_aplicacao', {'codigo_documento': 'id'}),
+        ('lote_paciente', {'codigo_paciente': 'id', 'numero_idade_paciente': 'idade'}),
+        ('lote_estabelecimento', {'codigo_cnes_estabelecimento': 'id', 'codigo_municipio_estabelecimento': 'municipio'}),
+    ):
+        colunas, linhas = linhas_da_tabela(df_unificado, [mapeamento])
+        conn.execute(f"DELETE FROM temp.{tabela}")
+        conn.executemany(f"INSERT INTO temp.{tabela} VALUES ({', '.join('?' * len(colunas))})", linhas)
+    if compacto:
+        # Um paciente ou estabelecimento novo ainda não tem id, então nenhuma aplicação gravada o referencia
+        conn.execute("""
+            INSERT OR IGNORE INTO temp.lote_aplicacao
+            SELECT a.codigo FROM temp.lote_paciente AS s
+            CROSS JOIN PacienteDim AS p ON p.codigo = s.id
+            CROSS JOIN AplicacaoFato AS a ON a.paciente_id = p.id
+            WHERE s.idade IS NOT NULL AND s.idade IS NOT p.idade
+            UNION ALL
+            SELECT a.codigo FROM temp.lote_estabelecimento AS s
+            CROSS JOIN EstabelecimentoDim AS e ON e.codigo = s.id
+            CROSS JOIN AplicacaoFato AS a ON a.estabelecimento_id = e.id
+            WHERE s.municipio IS NOT NULL
+              AND s.municipio IS NOT (SELECT m.codigo FROM MunicipioDim AS m WHERE m.id = e.municipio_id)
+        """)
+    else:
+        conn.execute("""
+            INSERT OR IGNORE INTO temp.lote_aplicacao
+            SELECT a.id FROM temp.lote_paciente AS s
+            LEFT JOIN Paciente AS p ON p.id = s.id
+            CROSS JOIN Aplicacao AS a ON a.paciente_fk = s.id
+            WHERE p.id IS NULL OR (s.idade IS NOT NULL AND s.idade IS NOT p.idade)
+            UNION ALL
+            SELECT a.id FROM temp.lote_estabelecimento AS s
+            LEFT JOIN Estabelecimento AS e ON e.id = s.id
+            CROSS JOIN Aplicacao AS a ON a.estabelecimento_fk = s.id
+            WHERE e.id IS NULL OR (s.municipio IS NOT NULL AND s.municipio IS NOT e.municipio_fk)
+        """)
+
+
+def registrar_lote_rotulos(conn, df_unificado: pd.DataFrame, compacto=False):
+    # Códigos (como aparecem nas views) das dimensões de ROTULOS_RESUMOS cujo rótulo o
+    # upsert do bloco vai mudar. Também chamada antes do upsert.
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS lote_rotulos (dimensao TEXT, codigo, PRIMARY KEY (dimensao, codigo))")
+    conn.execute("DELETE FROM temp.lote_rotulos")
+    for dimensao in dict.fromkeys(dimensao for dimensao, _, _ in ROTULOS_RESUMOS.values()):
+        colunas, linhas = linhas_da_tabela(df_unificado, CARGA_TABELAS[dimensao])
+        conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS rotulos_{dimensao} ({', '.join(colunas)})")
+        conn.execute(f"DELETE FROM temp.rotulos_{dimensao}")
+        conn.executemany(f"INSERT INTO temp.rotulos_{dimensao} VALUES ({', '.join('?' * len(colunas))})", linhas)
+        chave, demais = colunas[0], colunas[1:]
+        if compacto:
+            origem = (f"temp.rotulos_{dimensao} AS s CROSS JOIN {tabela_compacta(dimensao)} AS k ON k.codigo = s.{chave} "
+                      f"CROSS JOIN {dimensao} AS d ON d.codigo = k.id")
+        else:
+            origem = f"temp.rotulos_{dimensao} AS s CROSS JOIN {dimensao} AS d ON d.codigo = s.{chave}"
+        conn.execute(
+            f"INSERT OR IGNORE INTO temp.lote_rotulos SELECT ?, d.codigo FROM {origem} "
+            f"WHERE {' OR '.join(f'(s.{c} IS NOT NULL AND s.{c} IS NOT d.{c})' for c in demais)}",
+            (dimensao,)
+        )
+
 
-    tabelas_para_dropar = [
-        'Aplicacao', 'Paciente', 'Estabelecimento', 'Vacina', 'RacaCor', 'EtniaIndigena',
-        'Municipio', 'UF', 'Fabricante', 'DoseVacina', 'GrupoAtendimento', 'CategoriaAtendimento',
-        'TipoEstabelecimento', 'NaturezaEstabelecimento', 'LocalAplicacao', 'ViaAdministracao',
-        'EstrategiaVacinacao', 'CondicaoMaternal', 'OrigemRegistro', 'SistemaOrigem'
-    ]
-    for tabela in tabelas_para_dropar:
-        conn.execute(f'DROP TABLE IF EXISTS {tabela}')
+def preparar_banco(conn, recriar=True, compacto=False):
+    # Com recriar=False as tabelas existentes (e seus dados) são preservadas.
+    # Ao recriar, remove tanto as tabelas/views do schema.sql quanto as do esquema compacto.
+    if recriar:
+        nomes = TABELAS + [tabela_compacta(t) for t in TABELAS if t != 'CargaCheckpoint'] + list(RESUMOS)
+        objetos = conn.execute(
+            f"SELECT type, name FROM sqlite_master WHERE type IN ('table', 'view') AND name IN ({', '.join('?' * len(nomes))}) "
+            "ORDER BY type DESC", nomes
+        ).fetchall()
+        for tipo, nome in objetos:
+            conn.execute(f'DROP {tipo.upper()} IF EXISTS {nome}')
 
-    with open("schema.sql", "r", encoding="utf-8") as f:
+    resumos_existentes = conn.execute(
+        f"SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name IN ({', '.join('?' * len(RESUMOS))})",
+        list(RESUMOS)
+    ).fetchone()[0]
+
+    with open("schema_compacto.sql" if compacto else "schema.sql", "r", encoding="utf-8") as f:
+        conn.executescript(f.read())
+    with open("resumos.sql", "r", encoding="utf-8") as f:
         conn.executescript(f.read())
 
-    # Populando tabelas de dimensão
-    def carregar_dimensao(col_map, tabela):
-        df_dim = df_unificado[list(col_map.keys())].rename(columns=col_map).dropna(subset=[list(col_map.values())[0]]).drop_duplicates(subset=[list(col_map.values())[0]])
-        df_dim.to_sql(tabela, conn, if_exists='append', index=False)
-
-    carregar_dimensao({'codigo_raca_cor_paciente': 'codigo', 'nome_raca_cor_paciente': 'descricao'}, 'RacaCor')
-    carregar_dimensao({'codigo_etnia_indigena_paciente': 'codigo', 'nome_etnia_indigena_paciente': 'descricao'}, 'EtniaIndigena')
-
-    ufs_df = pd.concat([
-        df_unificado[['sigla_uf_paciente', 'nome_uf_paciente']].rename(columns={'sigla_uf_paciente': 'sigla', 'nome_uf_paciente': 'nome'}),
-        df_unificado[['sigla_uf_estabelecimento', 'nome_uf_estabelecimento']].rename(columns={'sigla_uf_estabelecimento': 'sigla', 'nome_uf_estabelecimento': 'nome'})
-    ]).dropna(subset=['sigla']).drop_duplicates(subset=['sigla'])
-    ufs_df.to_sql('UF', conn, if_exists='append', index=False)
-
-    municipios_df = pd.concat([
-        df_unificado[['codigo_municipio_paciente', 'nome_municipio_paciente', 'sigla_uf_paciente']].rename(columns={'codigo_municipio_paciente': 'codigo', 'nome_municipio_paciente': 'nome', 'sigla_uf_paciente': 'uf_sigla'}),
-        df_unificado[['codigo_municipio_estabelecimento', 'nome_municipio_estabelecimento', 'sigla_uf_estabelecimento']].rename(columns={'codigo_municipio_estabelecimento': 'codigo', 'nome_municipio_estabelecimento': 'nome', 'sigla_uf_estabelecimento': 'uf_sigla'})
-    ]).dropna(subset=['codigo']).drop_duplicates(subset=['codigo'])
-    municipios_df.to_sql('Municipio', conn, if_exists='append', index=False)
-
-    carregar_dimensao({'codigo_vacina_fabricante': 'codigo', 'descricao_vacina_fabricante': 'descricao'}, 'Fabricante')
-    carregar_dimensao({'codigo_dose_vacina': 'codigo', 'descricao_dose_vacina': 'descricao'}, 'DoseVacina')
-    carregar_dimensao({'codigo_vacina_grupo_atendimento': 'codigo', 'descricao_vacina_grupo_atendimento': 'descricao'}, 'GrupoAtendimento')
-    carregar_dimensao({'codigo_vacina_categoria_atendimento': 'codigo', 'descricao_vacina_categoria_atendimento': 'descricao'}, 'CategoriaAtendimento')
-    carregar_dimensao({'codigo_tipo_estabelecimento': 'codigo', 'descricao_tipo_estabelecimento': 'descricao'}, 'TipoEstabelecimento')
-    carregar_dimensao({'codigo_natureza_estabelecimento': 'codigo', 'descricao_natureza_estabelecimento': 'descricao'}, 'NaturezaEstabelecimento')
-    carregar_dimensao({'codigo_local_aplicacao': 'codigo', 'descricao_local_aplicacao': 'descricao'}, 'LocalAplicacao')
-    carregar_dimensao({'codigo_via_administracao': 'codigo', 'descricao_via_administracao': 'descricao'}, 'ViaAdministracao')
-    carregar_dimensao({'codigo_estrategia_vacinacao': 'codigo', 'descricao_estrategia_vacinacao': 'descricao'}, 'EstrategiaVacinacao')
-    carregar_dimensao({'codigo_condicao_maternal': 'codigo', 'descricao_condicao_maternal': 'descricao'}, 'CondicaoMaternal')
-    carregar_dimensao({'codigo_origem_registro': 'codigo', 'descricao_origem_registro': 'descricao'}, 'OrigemRegistro')
-    carregar_dimensao({'codigo_sistema_origem': 'codigo', 'descricao_sistema_origem': 'descricao'}, 'SistemaOrigem')
-
-    # Entidades principais
-    df_unificado[['codigo_paciente', 'tipo_sexo_paciente', 'numero_idade_paciente', 'numero_cep_paciente', 'descricao_nacionalidade_paciente', 'codigo_raca_cor_paciente', 'codigo_municipio_paciente', 'codigo_etnia_indigena_paciente']].rename(columns={
-        'codigo_paciente': 'id', 'tipo_sexo_paciente': 'sexo', 'numero_idade_paciente': 'idade', 'numero_cep_paciente': 'cep', 'descricao_nacionalidade_paciente': 'nacionalidade', 'codigo_raca_cor_paciente': 'raca_cor_fk', 'codigo_municipio_paciente': 'municipio_fk', 'codigo_etnia_indigena_paciente': 'etnia_indigena_fk'
-    }).dropna(subset=['id']).drop_duplicates(subset=['id']).to_sql("Paciente", conn, if_exists="append", index=False)
+    # Banco anterior aos resumos: calcula-os uma vez antes de passar a mantê-los por lote
+    if not recriar and resumos_existentes < len(RESUMOS):
+        atualizar_resumos(conn)
+        conn.commit()
 
-    df_unificado[['codigo_cnes_estabelecimento', 'nome_razao_social_estabelecimento', 'nome_fantasia_estalecimento', 'codigo_municipio_estabelecimento', 'codigo_tipo_estabelecimento', 'codigo_natureza_estabelecimento']].rename(columns={
-        'codigo_cnes_estabelecimento': 'id', 'nome_razao_social_estabelecimento': 'razao_social', 'nome_fantasia_estalecimento': 'nome_fantasia', 'codigo_municipio_estabelecimento': 'municipio_fk', 'codigo_tipo_estabelecimento': 'tipo_fk', 'codigo_natureza_estabelecimento': 'natureza_fk'
-    }).dropna(subset=['id']).drop_duplicates(subset=['id']).to_sql("Estabelecimento", conn, if_exists="append", index=False)
 
-    df_unificado[['codigo_vacina', 'descricao_vacina', 'sigla_vacina', 'codigo_vacina_fabricante', 'codigo_vacina_grupo_atendimento', 'codigo_vacina_categoria_atendimento']].rename(columns={
-        'codigo_vacina': 'id', 'descricao_vacina': 'descricao', 'sigla_vacina': 'sigla', 'codigo_vacina_fabricante': 'fabricante_fk', 'codigo_vacina_grupo_atendimento': 'grupo_atendimento_fk', 'codigo_vacina_categoria_atendimento': 'categoria_atendimento_fk'
-    }).dropna(subset=['id']).drop_duplicates(subset=['id']).to_sql("Vacina", conn, if_exists="append", index=False)
+def configurar_pragmas_carga(conn, incremental=False):
+    # Ajustes só para a carga: WAL, sem fsync, cache grande e checagem de FK adiada
+    # para o final (ver finalizar_carga). O schema.sql liga foreign_keys, então esta
+    # função deve ser chamada depois de preparar_banco. Sem fsync, uma queda do sistema
+    # pode corromper o arquivo: aceitável num banco novo, que é só carregado de novo, mas
+    # não na carga incremental sobre um banco já populado, que usa NORMAL (barato com WAL).
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(f"PRAGMA synchronous = {'NORMAL' if incremental else 'OFF'}")
+    conn.execute("PRAGMA cache_size = -262144")  # 256 MiB
+    conn.execute("PRAGMA temp_store = MEMORY")
+    conn.execute("PRAGMA foreign_keys = OFF")
+
+
+def criar_indices(conn, caminho_indices="indices.sql"):
+    # Índices secundários são criados depois dos dados, em uma única passada por tabela
+    if Path(caminho_indices).exists():
+        with open(caminho_indices, "r", encoding="utf-8") as f:
+            conn.executescript(f.read())
+
 
-    df_unificado[['codigo_documento', 'data_vacina', 'codigo_lote_vacina', 'status_documento', 'codigo_paciente', 'codigo_vacina', 'codigo_cnes_estabelecimento', 'codigo_dose_vacina', 'codigo_local_aplicacao', 'codigo_via_administracao', 'codigo_estrategia_vacinacao', 'codigo_condicao_maternal', 'codigo_origem_registro', 'codigo_sistema_origem']].rename(columns={
-        'codigo_documento': 'id', 'data_vacina': 'data_aplicacao', 'codigo_lote_vacina': 'lote', 'codigo_paciente': 'paciente_fk', 'codigo_vacina': 'vacina_fk', 'codigo_cnes_estabelecimento': 'estabelecimento_fk', 'codigo_dose_vacina': 'dose_fk', 'codigo_local_aplicacao': 'local_aplicacao_fk', 'codigo_via_administracao': 'via_administracao_fk', 'codigo_estrategia_vacinacao': 'estrategia_fk', 'codigo_condicao_maternal': 'condicao_maternal_fk', 'codigo_origem_registro': 'origem_registro_fk', 'codigo_sistema_origem': 'sistema_origem_fk'
-    }).dropna(subset=['id']).drop_duplicates(subset=['id']).to_sql("Aplicacao", conn, if_exists="append", index=False)
+def registrar_versao_carga(conn):
+    # Nova versão a cada carga: invalida os resultados guardados no cache do painel
+    conn.execute(
+        "INSERT INTO CargaVersao (id, versao, atualizado_em) VALUES (1, ?, datetime('now')) "
+        "ON CONFLICT(id) DO UPDATE SET versao = excluded.versao, atualizado_em = excluded.atualizado_em",
+        (uuid.uuid4().hex,)
+    )
 
+
+def finalizar_carga(conn, compacto=False):
+    criar_indices(conn, "indices_compacto.sql" if compacto else "indices.sql")
+
+    violacoes = conn.execute("PRAGMA foreign_key_check").fetchall()
+    if violacoes:
+        por_tabela = {}
+        for tabela, _, referenciada, _ in violacoes:
+            por_tabela[(tabela, referenciada)] = por_tabela.get((tabela, referenciada), 0) + 1
+        for (tabela, referenciada), qtd in por_tabela.items():
+            print(f"AVISO: {qtd} linhas de {tabela} referenciam registros inexistentes em {referenciada}.")
+
+    conn.execute("ANALYZE")
+    registrar_versao_carga(conn)
     conn.commit()
+
+    # Volta ao journal padrão para o banco final ser um único arquivo
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.execute("PRAGMA journal_mode = DELETE")
+    conn.execute("PRAGMA synchronous = FULL")
+    conn.execute("PRAGMA foreign_keys = ON")
+
+
+def valores_da_coluna(serie: pd.Series):
+    # Lista de valores prontos para o SQLite: None no lugar de nulos e datas em ISO
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        # Traduz os códigos inteiros direto pela lista de categorias (-1, nulo, cai no None)
+        categorias = np.array(list(serie.cat.categories) + [None], dtype=object)
+        return categorias[serie.cat.codes.to_numpy()].tolist()
+    if pd.api.types.is_datetime64_any_dtype(serie):
+        serie = serie.dt.strftime('%Y-%m-%d')
+    return serie.astype(object).where(serie.notna(), None).tolist()
+
+
+def linhas_da_tabela(df_unificado: pd.DataFrame, mapeamentos):
+    # Monta as tuplas a inserir: remove chaves nulas e repetidas antes de copiar as demais
+    # colunas, renomeia, junta as origens e troca NaN por None. Em colunas categóricas a
+    # deduplicação compara só os códigos inteiros.
+    partes = []
+    for m in mapeamentos:
+        chave = df_unificado[next(iter(m))]
+        codigos = chave.cat.codes if isinstance(chave.dtype, pd.CategoricalDtype) else chave
+        manter = chave.notna() & ~codigos.duplicated()
+        partes.append(df_unificado.loc[manter, list(m.keys())].rename(columns=m))
+    df = partes[0] if len(partes) == 1 else pd.concat(partes).drop_duplicates(subset=[partes[0].columns[0]])
+    colunas = list(df.columns)
+    return colunas, list(zip(*(valores_da_coluna(df[c]) for c in colunas)))
+
+
+def inserir_em_massa(conn, tabela, colunas, linhas):
+    # Upsert pela chave primária (sempre a primeira coluna). Registros já gravados, por
+    # um bloco anterior ou por uma execução anterior, são atualizados em vez de
+    # duplicados; valores nulos não apagam os já conhecidos.
+    chave, demais = colunas[0], colunas[1:]
+    sql = f"INSERT INTO {tabela} ({', '.join(colunas)}) VALUES ({', '.join('?' * len(colunas))})"
+    if demais:
+        atualizacoes = ', '.join(f"{c} = COALESCE(excluded.{c}, {c})" for c in demais)
+        sql += f" ON CONFLICT({chave}) DO UPDATE SET {atualizacoes}"
+    else:
+        sql += f" ON CONFLICT({chave}) DO NOTHING"
+    conn.executemany(sql, linhas)
+
+
+def inserir_compacto(conn, tabela, colunas, linhas):
+    # Versão de inserir_em_massa para o esquema compacto: as linhas, no formato do
+    # schema.sql, passam por uma tabela temporária e os códigos são trocados pelos ids
+    # inteiros com joins no próprio SQLite (sem manter os mapeamentos em memória).
+    conn.execute(f"CREATE TEMP TABLE IF NOT EXISTS stg_{tabela} ({', '.join(colunas)})")
+    conn.execute(f"DELETE FROM temp.stg_{tabela}")
+    conn.executemany(f"INSERT INTO temp.stg_{tabela} VALUES ({', '.join('?' * len(colunas))})", linhas)
+
+    destino, origem, joins = ['codigo'], [f's.{colunas[0]}'], []
+    for i, coluna in enumerate(colunas[1:]):
+        if coluna in REFERENCIAS_COMPACTAS:
+            referenciada, coluna_id = REFERENCIAS_COMPACTAS[coluna]
+            joins.append(f"LEFT JOIN {tabela_compacta(referenciada)} AS r{i} ON r{i}.codigo = s.{coluna}")
+            destino.append(coluna_id)
+            origem.append(f"r{i}.id")
+        elif coluna == 'data_aplicacao':
+            destino += ['dia', 'dia_semana', 'mes']
+            origem += [
+                f"CAST(julianday(s.{coluna}) - 2440587.5 AS INTEGER)",
+                f"CAST(strftime('%w', s.{coluna}) AS INTEGER)",
+                f"CAST(strftime('%m', s.{coluna}) AS INTEGER)",
+            ]
+        else:
+            destino.append(coluna)
+            origem.append(f"s.{coluna}")
+
+    atualizacoes = ', '.join(f"{c} = COALESCE(excluded.{c}, {c})" for c in destino[1:])
+    # O "WHERE true" evita a ambiguidade do ON CONFLICT logo após um JOIN
+    conn.execute(
+        f"INSERT INTO {tabela_compacta(tabela)} ({', '.join(destino)}) "
+        f"SELECT {', '.join(origem)} FROM temp.stg_{tabela} AS s {' '.join(joins)} WHERE true "
+        f"ON CONFLICT(codigo) DO UPDATE SET {atualizacoes}"
+    )
+
+
+def carregar_bloco(conn, df_unificado: pd.DataFrame, estatisticas=None, compacto=False, manter_resumos=False, tabelas=None):
+    # Grava todas as tabelas do bloco (ou só as de `tabelas`); a transação é confirmada
+    # por quem chama. `estatisticas` acumula [linhas, segundos] por tabela entre os blocos.
+    # Com manter_resumos, as tabelas de resumo são atualizadas com o delta do bloco.
+    if manter_resumos:
+        registrar_lote_aplicacao(conn, df_unificado, compacto)
+        registrar_lote_rotulos(conn, df_unificado, compacto)
+        atualizar_resumos(conn, sinal=-1, somente_lote=True)
+
+    inserir = inserir_compacto if compacto else inserir_em_massa
+    for tabela, mapeamentos in CARGA_TABELAS.items():
+        if tabelas is not None and tabela not in tabelas:
+            continue
+        inicio = time.perf_counter()
+        colunas, linhas = linhas_da_tabela(df_unificado, mapeamentos)
+        inserir(conn, tabela, colunas, linhas)
+        if estatisticas is not None:
+            acumulado = estatisticas.setdefault(tabela, [0, 0.0])
+            acumulado[0] += len(linhas)
+            acumulado[1] += time.perf_counter() - inicio
+
+    if manter_resumos:
+        atualizar_resumos(conn, sinal=1, somente_lote=True)
+
+
+def imprimir_estatisticas(estatisticas):
+    for tabela, (linhas, segundos) in estatisticas.items():
+        taxa = linhas / segundos if segundos else 0
+        print(f"  {tabela}: {linhas} linhas em {segundos:.2f}s ({taxa:,.0f} linhas/s)")
+
+
+def criar_banco_e_popular(df_unificado, caminho_db="vacinacao.db", incremental=False, compacto=None,
+                          particionar=False, processos=None, proxima_pagina=None):
+    # Aceita um DataFrame único ou um iterável de DataFrames (ex.: ler_spool_em_blocos);
+    # cada bloco é carregado e confirmado antes do próximo ser lido.
+    # Com incremental=True o banco existente é mantido e os registros são mesclados (upsert).
+    # Com compacto=True usa o schema_compacto.sql (chaves inteiras + views de compatibilidade);
+    # sem `compacto`, uma carga incremental segue o esquema do banco existente.
+    # Com particionar=True grava um banco por UF em vez de `caminho_db` (ver ETAPA 5).
+    # `proxima_pagina` (ex.: devolvida por coletar_para_spool) é gravada como checkpoint,
+    # para a próxima carga incremental continuar dali em vez de recomeçar da página 0.
+    blocos = [df_unificado] if isinstance(df_unificado, pd.DataFrame) else df_unificado
+    if particionar:
+        if incremental or compacto:
+            raise ValueError("A carga particionada só existe como carga completa no schema.sql")
+        return criar_bancos_particionados(blocos, caminho_db, processos)
+
+    conn = sqlite3.connect(caminho_db)
+    if compacto is None:
+        compacto = incremental and eh_banco_compacto(conn)
+    with metricas.etapa("preparar_banco"):
+        preparar_banco(conn, recriar=not incremental, compacto=compacto)
+        configurar_pragmas_carga(conn)
+
+    total = 0
+    estatisticas = {}
+    with metricas.etapa("carga"):
+        for bloco in blocos:
+            carregar_bloco(conn, bloco, estatisticas, compacto, manter_resumos=incremental)
+            conn.commit()
+            total += len(bloco)
+        if proxima_pagina is not None:
+            salvar_checkpoint(conn, proxima_pagina)
+            conn.commit()
+
+    # Numa carga completa é mais barato agregar tudo de uma vez no final
+    if not incremental:
+        with metricas.etapa("resumos"):
+            atualizar_resumos(conn)
+            conn.commit()
+
+    with metricas.etapa("finalizar_carga"):
+        finalizar_carga(conn, compacto)
+    conn.close()
+    with metricas.etapa("aquecer_cache"):
+        aquecer_cache(caminho_db)
+    with metricas.etapa("snapshot_colunar"):
+        exportar_snapshot(caminho_db)
+    metricas.registrar_tabelas(estatisticas)
+    print(f"Banco de dados salvo como '{caminho_db}' ({total} registros processados)")
+    imprimir_estatisticas(estatisticas)
+    pico = metricas.pico_memoria_mb()
+    if pico is not None:
+        print(f"  Pico de memória (RSS): {pico:,.0f} MB")
+    return estatisticas
+
+
+# ---------- ETAPA 4: Carga incremental ----------
+def ler_checkpoint(conn):
+    linha = conn.execute("SELECT proxima_pagina FROM CargaCheckpoint WHERE id = 1").fetchone()
+    return linha[0] if linha else 0
+
+
+def salvar_checkpoint(conn, proxima_pagina):
+    conn.execute(
+        "INSERT INTO CargaCheckpoint (id, proxima_pagina, atualizado_em) VALUES (1, ?, datetime('now')) "
+        "ON CONFLICT(id) DO UPDATE SET proxima_pagina = excluded.proxima_pagina, atualizado_em = excluded.atualizado_em",
+        (proxima_pagina,)
+    )
+
+
+def carga_incremental(caminho_db="vacinacao.db", max_paginas=100, delay=1, workers=None, taxa_por_segundo=10,
+                      base_url=API_URL, paginas_por_transacao=10, compacto=None):
+    # Retoma a coleta a partir do checkpoint salvo no banco e mescla as páginas novas.
+    # Cada lote de páginas é gravado junto com o novo checkpoint em uma única transação,
+    # então uma falha no meio da execução perde no máximo o lote em andamento.
+    # Sem `compacto`, segue o esquema do banco existente (o padrão para um banco novo).
+    conn = sqlite3.connect(caminho_db)
+    if compacto is None:
+        compacto = eh_banco_compacto(conn)
+    with metricas.etapa("preparar_banco"):
+        preparar_banco(conn, recriar=False, compacto=compacto)
+        configurar_pragmas_carga(conn, incremental=True)
+
+    inicio = ler_checkpoint(conn)
+    print(f"Retomando a coleta a partir da página {inicio}.")
+
+    lote, proxima_pagina, paginas_no_lote, total = [], inicio, 0, 0
+    estatisticas = {}
+
+    def gravar_lote():
+        with conn:
+            if lote:
+                carregar_bloco(conn, tabela_enxuta(lote), estatisticas, compacto, manter_resumos=True)
+            salvar_checkpoint(conn, proxima_pagina)
+            registrar_versao_carga(conn)
+
+    with metricas.etapa("coleta_e_carga"):
+        for pagina, dados in paginas_da_api(max_paginas, delay, workers, taxa_por_segundo, base_url, inicio):
+            lote.extend(dados)
+            total += len(dados)
+            paginas_no_lote += 1
+            # Uma página incompleta ainda pode crescer: ela é buscada de novo na próxima execução
+            proxima_pagina = pagina + 1 if len(dados) >= LIMITE_POR_PAGINA else pagina
+            print(f"Página {pagina} coletada com {len(dados)} registros.")
+
+            if paginas_no_lote >= paginas_por_transacao:
+                gravar_lote()
+                lote, paginas_no_lote = [], 0
+
+        gravar_lote()
+    with metricas.etapa("finalizar_carga"):
+        finalizar_carga(conn, compacto)
     conn.close()
-    print(f"Banco de dados salvo como '{caminho_db}'")
+    with metricas.etapa("aquecer_cache"):
+        aquecer_cache(caminho_db)
+    with metricas.etapa("snapshot_colunar"):
+        exportar_snapshot(caminho_db)
+    metricas.registrar_tabelas(estatisticas)
+    print(f"Carga incremental concluída: {total} registros mesclados, próxima página {proxima_pagina}.")
+    imprimir_estatisticas(estatisticas)
+    return total
+
+
+# ---------- ETAPA 5: Banco particionado por UF ----------
+# Aplicacao, Paciente e Estabelecimento são divididos pela UF do estabelecimento, um
+# banco SQLite por UF em <banco>_shards/, carregados em paralelo por processos; as
+# demais tabelas (dimensões) são copiadas em todos. O painel consulta as partições em
+# paralelo e soma os resultados (consultas.executar_consulta_particionada), e o
+# manifesto shards.json diz em quais partições estão cada UF e município dos filtros.
+TABELAS_PARTICIONADAS = ['Aplicacao', 'Paciente', 'Estabelecimento']
+COLUNA_PARTICAO = 'sigla_uf_estabelecimento'
+SEM_UF = 'SEM_UF'
+
+
+def carregar_particao(sigla, arquivos, caminho_dimensoes, caminho_pacientes, caminho_particao, config_metricas):
+    # Roda em um processo do pool: parte de uma cópia do banco de dimensões e carrega
+    # os blocos da UF. Devolve as estatísticas e as UFs/municípios dos estabelecimentos.
+    metricas.configurar(*config_metricas)
+    estatisticas = {}
+    with metricas.etapa(f"particao {sigla}"):
+        shutil.copyfile(caminho_dimensoes, caminho_particao)
+        conn = sqlite3.connect(caminho_particao)
+        configurar_pragmas_carga(conn)
+        for arquivo in arquivos:
+            carregar_bloco(conn, pd.read_pickle(arquivo), estatisticas, tabelas=['Estabelecimento', 'Aplicacao'])
+            conn.commit()
+        # Um paciente pode ter doses em várias UFs: cada partição recebe os pacientes das
+        # suas aplicações, já mesclados na 1ª passada como na carga em um banco só
+        conn.execute("ATTACH DATABASE ? AS pacientes", (caminho_pacientes,))
+        conn.execute(
+            "INSERT INTO Paciente SELECT * FROM pacientes.Paciente "
+            "WHERE id IN (SELECT paciente_fk FROM Aplicacao)"
+        )
+        conn.commit()
+        conn.execute("DETACH DATABASE pacientes")
+        atualizar_resumos(conn)
+        conn.commit()
+        finalizar_carga(conn)
+        locais = conn.execute(
+            "SELECT DISTINCT m.uf_sigla, m.nome FROM Estabelecimento AS e JOIN Municipio AS m ON e.municipio_fk = m.codigo"
+        ).fetchall()
+        conn.close()
+    return sigla, estatisticas, locais
+
+
+def criar_bancos_particionados(blocos, caminho_db="vacinacao.db", processos=None):
+    pasta = pasta_particoes_padrao(caminho_db)
+    temporaria = pasta.with_name(pasta.name + ".tmp")
+    shutil.rmtree(temporaria, ignore_errors=True)
+    (temporaria / "blocos").mkdir(parents=True)
+
+    # 1ª passada: dimensões e pacientes (mesmo upsert da carga normal) e os blocos
+    # separados por UF em arquivos temporários
+    caminho_dimensoes = temporaria / "dimensoes.db"
+    caminho_pacientes = temporaria / "pacientes.db"
+    conexoes = []
+    for caminho in (caminho_dimensoes, caminho_pacientes):
+        conn = sqlite3.connect(caminho)
+        preparar_banco(conn)
+        configurar_pragmas_carga(conn)
+        conexoes.append(conn)
+    dimensoes = [t for t in CARGA_TABELAS if t not in TABELAS_PARTICIONADAS]
+    arquivos = {}
+    total = 0
+    estatisticas = {}
+    with metricas.etapa("dimensoes_e_divisao"):
+        for numero, bloco in enumerate(blocos):
+            carregar_bloco(conexoes[0], bloco, estatisticas, tabelas=dimensoes)
+            carregar_bloco(conexoes[1], bloco, estatisticas, tabelas=['Paciente'])
+            for conn in conexoes:
+                conn.commit()
+            siglas = bloco[COLUNA_PARTICAO].astype(object).fillna(SEM_UF)
+            for sigla, parte in bloco.groupby(siglas, sort=False):
+                arquivo = temporaria / "blocos" / f"{sigla}_{numero}.pkl"
+                parte.to_pickle(arquivo)
+                arquivos.setdefault(sigla, []).append(arquivo)
+            total += len(bloco)
+    for conn in conexoes:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+        conn.execute("PRAGMA journal_mode = DELETE")
+        conn.close()
+
+    # 2ª passada: uma partição por processo; spawn para não herdar conexões abertas
+    manifesto = {"versao": uuid.uuid4().hex, "criado_em": time.strftime("%Y-%m-%d %H:%M:%S"),
+                 "shards": {}, "ufs": {}, "municipios": {}}
+    with metricas.etapa("carga_particoes"), ProcessPoolExecutor(
+        max_workers=processos, mp_context=multiprocessing.get_context("spawn")
+    ) as executor:
+        futuros = [
+            executor.submit(carregar_particao, sigla, lista, str(caminho_dimensoes), str(caminho_pacientes),
+                            str(temporaria / f"UF_{sigla}.db"), metricas.configuracao())
+            for sigla, lista in arquivos.items()
+        ]
+        for futuro in futuros:
+            sigla, parciais, locais = futuro.result()
+            manifesto["shards"][sigla] = f"UF_{sigla}.db"
+            for tabela, (linhas, segundos) in parciais.items():
+                acumulado = estatisticas.setdefault(tabela, [0, 0.0])
+                acumulado[0] += linhas
+                acumulado[1] += segundos
+            for uf, municipio in locais:
+                manifesto["ufs"].setdefault(uf, []).append(sigla)
+                manifesto["municipios"].setdefault(municipio, []).append(sigla)
+
+    shutil.rmtree(temporaria / "blocos")
+    caminho_dimensoes.unlink()
+    caminho_pacientes.unlink()
+    with open(temporaria / ARQUIVO_MANIFESTO, "w", encoding="utf-8") as f:
+        json.dump(manifesto, f, ensure_ascii=False, indent=1)
+
+    # Troca a pasta anterior só no final, como a cópia colunar
+    antiga = pasta.with_name(pasta.name + ".old")
+    shutil.rmtree(antiga, ignore_errors=True)
+    if pasta.exists():
+        pasta.rename(antiga)
+    temporaria.rename(pasta)
+    shutil.rmtree(antiga, ignore_errors=True)
+
+    with metricas.etapa("aquecer_cache"):
+        aquecer_cache_particoes(pasta)
+    metricas.registrar_tabelas(estatisticas)
+    print(f"Bancos por UF salvos em '{pasta}' ({len(manifesto['shards'])} partições, {total} registros processados)")
+    imprimir_estatisticas(estatisticas)
+    return estatisticas
 
 
 # ---------- EXECUÇÃO COMPLETA ----------
 if __name__ == "__main__":
-    dados = coletar_dados_vacinacao(max_paginas=100, delay=1, salvar_arquivo=True)
-    df = unificar_jsons_em_tabela("dados_vacinacao_2025.json")
+    compacto = "--compacto" in sys.argv
 
     # Garante que o schema.sql esteja presente antes de rodar
     if not Path("schema.sql").exists():
         print("ERRO: Arquivo 'schema.sql' com o esquema do banco não encontrado.")
+    elif "--incremental" in sys.argv:
+        carga_incremental("vacinacao.db", max_paginas=100, workers=8, taxa_por_segundo=10, compacto=compacto or None)
     else:
-        criar_banco_e_popular(df, caminho_db="vacinacao.db")
+        caminho_spool = "dados_vacinacao_2025.ndjson.gz"
+        _, proxima_pagina = coletar_para_spool(caminho_spool, max_paginas=100, workers=8, taxa_por_segundo=10)
+        criar_banco_e_popular(ler_spool_em_blocos(caminho_spool, enxuto=True), caminho_db="vacinacao.db", compacto=compacto,
+                              particionar="--particionado" in sys.argv, proxima_pagina=proxima_pagina)